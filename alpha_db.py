@@ -1,28 +1,181 @@
+import functools
+import os
 import sqlite3
 import json
+import zlib
+
+from notify import Listener, Notifier
+
+try:
+    from compression import zstd  # python 3.14+
+except ImportError:
+    zstd = None
+
+
+# bump when tables change, DBs of older version are migrated when opened.
+SCHEMA_VERSION = 3
+ARCHIVE_SCHEMA_VERSION = 1
+
+
+def archive_path(dbfile: str) -> str:
+    root, _ = os.path.splitext(dbfile)
+    return root + ".archive.db"
 
 
 class AlphaDB:
-    def __init__(self, dbfile: str):
+    """
+    Local sqlite DB. Old terminal simulations and their alphas can be moved to
+    a compressed archive DB (`alpha.archive.db` next to `alpha.db` by default),
+    which is attached as schema `archive` and read through transparently.
+    """
+
+    def __init__(self, dbfile: str, archive_file: str | None = None):
         self.dbfile = dbfile
+        self.archive_file = archive_file or archive_path(dbfile)
         self._conn = None
 
     def __enter__(self):
         self._conn = sqlite3.connect(self.dbfile)
+        self._conn.create_function("compress", 1, compress, deterministic=True)
+        self._conn.create_function("decompress", 1, decompress, deterministic=True)
+        self._init_schema()
+
+        if self.dbfile != ":memory:" and os.path.exists(self.archive_file):
+            self.attach_archive()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         self._conn.close()
 
+    def _init_schema(self, schema: str = "main"):
+        """
+        Create and migrate tables of `schema` (main or archive) once per
+        schema version (sqlite user_version), a DB already up to date costs
+        one pragma read.
+        """
+        if schema == "main":
+            version = SCHEMA_VERSION
+            init_tables = (Fields.init_table, Simulations.init_table, Alphas.init_table)
+        else:
+            version = ARCHIVE_SCHEMA_VERSION
+            init_tables = (Archive.init_table,)
+
+        if self._schema_version(schema) >= version:
+            return
+
+        cursor = self._conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # another process may have migrated it while waiting for the lock
+            if self._schema_version(schema) < version:
+                for init_table in init_tables:
+                    init_table(cursor)
+                cursor.execute(f"PRAGMA {schema}.user_version = {version}")
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+
+    def _schema_version(self, schema: str = "main") -> int:
+        return self._conn.execute(f"PRAGMA {schema}.user_version").fetchone()[0]
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self._conn
+
+    @property
+    def archived(self) -> bool:
+        return _has_archive(self._conn)
+
     def fields(self):
         return Fields(self._conn)
 
     def simulations(self):
-        return Simulations(self._conn)
+        return Simulations(self._conn, Notifier(self.dbfile))
+
+    def listener(self) -> Listener:
+        """
+        Listener woken up when simulations of this DB start.
+        """
+        return Listener(self.dbfile)
 
     def alphas(self):
         return Alphas(self._conn)
 
+    def attach_archive(self):
+        """
+        Attach (and create if missing) the archive DB, then create temp views
+        `all_simulations` and `all_alphas` over hot and archived rows.
+        """
+        if not _has_archive(self._conn):
+            self._conn.execute("ATTACH DATABASE ? AS archive", (self.archive_file,))
+        self._init_schema("archive")
+
+        # temp views live in memory of this connection only, no disk write
+        cursor = self._conn.cursor()
+        cursor.execute(CREATE_ALL_SIMULATIONS_VIEW)
+        cursor.execute(CREATE_ALL_ALPHAS_VIEW)
+
+    def archive(self, codec: str = "zlib"):
+        if not _has_archive(self._conn):
+            self.attach_archive()
+        return Archive(self._conn, codec)
+
+
+class Row:
+    """
+    Read only row of a query, values are taken from the sqlite tuple when
+    accessed and json columns are decoded on first access only.
+    """
+
+    __slots__ = ("_row", "_decoded")
+
+    # item keys that differ from the attribute name
+    _aliases = {}
+
+    def __init__(self, row: tuple):
+        self._row = row
+        self._decoded = None
+
+    def __getitem__(self, key: str):
+        name = self._aliases.get(key, key)
+        if not isinstance(getattr(type(self), name, None), property):
+            raise KeyError(key)
+        return getattr(self, name)
+
+    def __repr__(self):
+        return "{}{}".format(type(self).__name__, self._row)
+
+
+def _column(idx: int) -> property:
+    return property(lambda self: self._row[idx])
+
+
+def _json_column(idx: int) -> property:
+    def get(self):
+        if self._decoded is None:
+            self._decoded = {}
+        if idx not in self._decoded:
+            raw = self._row[idx]
+            self._decoded[idx] = None if raw is None else json.loads(raw)
+        return self._decoded[idx]
+
+    return property(get)
+
+
+class FieldRow(Row):
+    __slots__ = ()
+
+    id = _column(0)
+    type = _column(1)
+    dataset_id = _column(2)
+    category_id = _column(3)
+    subcategroy_id = _column(4)
+    universe = _column(5)
+    region = _column(6)
+    delay = _column(7)
+    description = _column(8)
+
 
 CREATE_FIELDS_TABLE = """CREATE TABLE IF NOT EXISTS fields(
     id TEXT PRIMARY KEY,
@@ -37,6 +190,16 @@ CREATE_FIELDS_TABLE = """CREATE TABLE IF NOT EXISTS fields(
 )
 """
 
+# settings whose fields were all crawled, without type, dataset or limit
+# filter. fields of other settings may be partial. (version 3)
+CREATE_FIELD_CRAWLS_TABLE = """CREATE TABLE IF NOT EXISTS field_crawls(
+    region TEXT NOT NULL,
+    universe TEXT NOT NULL,
+    delay INTEGER NOT NULL,
+    crawled_at INTEGER NOT NULL,
+    PRIMARY KEY(region, universe, delay)
+)"""
+
 INSERT_FIELDS_TABLE = """INSERT INTO fields
     VALUES(:id, :type, :dataset_id, :category_id, :subcategroy_id, :universe, :region, :delay, :description)"""
 
@@ -44,12 +207,11 @@ INSERT_FIELDS_TABLE = """INSERT INTO fields
 class Fields:
     def __init__(self, conn: sqlite3.Connection):
         self._conn = conn
-        self._init_table()
 
-    def _init_table(self):
-        cursor = self._conn.cursor()
+    @staticmethod
+    def init_table(cursor: sqlite3.Cursor):
         cursor.execute(CREATE_FIELDS_TABLE)
-        self._conn.commit()
+        cursor.execute(CREATE_FIELD_CRAWLS_TABLE)
 
     def from_brain_resp(self, field: dict):
         return {
@@ -69,21 +231,67 @@ class Fields:
         cursor.executemany(INSERT_FIELDS_TABLE, map(self.from_brain_resp, fields_list))
         self._conn.commit()
 
+    def crawled(self, region: str, universe: str, delay: int):
+        """
+        Record that every field of the settings has been crawled.
+        """
+        cursor = self._conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO field_crawls VALUES(?, ?, ?, UNIXEPOCH())",
+            (region, universe, delay),
+        )
+        self._conn.commit()
+
+    def is_complete(self, region: str, universe: str, delay: int) -> bool:
+        cursor = self._conn.cursor()
+        cursor.execute(
+            "SELECT 1 FROM field_crawls WHERE region = ? AND universe = ? AND delay = ?",
+            (region, universe, delay),
+        )
+        return cursor.fetchone() is not None
+
+    def types(self, region: str, universe: str, delay: int) -> dict:
+        """
+        Map field id to field type for the given simulation settings.
+        """
+        cursor = self._conn.cursor()
+        cursor.execute(
+            "SELECT id, type FROM fields WHERE region = ? AND universe = ? AND delay = ?",
+            (region, universe, delay),
+        )
+        return dict(cursor.fetchall())
+
+    def known_types(self, region: str, universe: str, delay: int) -> dict | None:
+        """
+        Field types of the settings if all its fields are crawled, else None:
+        a field missing from a partial crawl may well exist.
+        """
+        if not self.is_complete(region, universe, delay):
+            return None
+        return self.types(region, universe, delay)
+
     def filter(self, data_type: str):
         cursor = self._conn.cursor()
         cursor.execute("SELECT * FROM fields WHERE type = ?", (data_type,))
-        for row in cursor:
-            yield {
-                "id": row[0],
-                "type": row[1],
-                "dataset_id": row[2],
-                "category_id": row[3],
-                "subcategroy_id": row[4],
-                "universe": row[5],
-                "region": row[6],
-                "delay": row[7],
-                "description": row[8],
-            }
+        # wrapping plain tuples is cheaper than a python row_factory call
+        yield from map(FieldRow, cursor)
+
+
+class SimulationRow(Row):
+    __slots__ = ()
+
+    id = _column(0)
+    expr = _column(1)
+    type = _column(2)
+    settings = _json_column(3)
+    status = _column(4)
+    created_at = _column(5)
+    simulated_at = _column(6)
+    simulation_id = _column(7)
+    completed_at = _column(8)
+    alpha_id = _column(9)
+    reason = _column(10)
+    account = _column(11)
 
 
 CREATE_SIMULATION_TABLE = """CREATE TABLE IF NOT EXISTS simulations(
@@ -96,49 +304,119 @@ CREATE_SIMULATION_TABLE = """CREATE TABLE IF NOT EXISTS simulations(
     simulated_at INTERGER,
     simulation_id TEXT,
     completed_at INTERGER,
-    alpha_id TEXT
+    alpha_id TEXT,
+    reason TEXT,
+    account TEXT
+)"""
+
+# columns added after the table was first released, created on old DBs.
+SIMULATION_TABLE_NEW_COLUMNS = {"reason": "TEXT", "account": "TEXT"}
+
+# change sequence of every table and status, bumped by triggers so changes
+# made by any process (including plain sql) are seen.
+CREATE_CHANGES_TABLE = """CREATE TABLE IF NOT EXISTS changes(
+    tbl TEXT NOT NULL,
+    status TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY(tbl, status)
 )"""
 
+CREATE_SIMULATION_INSERT_TRIGGER = """CREATE TRIGGER IF NOT EXISTS simulations_insert_change
+    AFTER INSERT ON simulations
+BEGIN
+    INSERT INTO changes VALUES('simulations', NEW.status, 1)
+        ON CONFLICT(tbl, status) DO UPDATE SET seq = seq + 1;
+END"""
+
+CREATE_SIMULATION_UPDATE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS simulations_update_change
+    AFTER UPDATE OF status ON simulations
+BEGIN
+    INSERT INTO changes VALUES('simulations', NEW.status, 1)
+        ON CONFLICT(tbl, status) DO UPDATE SET seq = seq + 1;
+END"""
+
 
 class Simulations:
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: sqlite3.Connection, notifier: Notifier | None = None):
         self._conn = conn
-        self._init_table()
+        self._notifier = notifier
 
-    def _init_table(self):
-        cursor = self._conn.cursor()
+    @staticmethod
+    def init_table(cursor: sqlite3.Cursor):
         cursor.execute(CREATE_SIMULATION_TABLE)
-        self._conn.commit()
+
+        columns = [x[1] for x in cursor.execute("PRAGMA table_info(simulations)")]
+        for name, type in SIMULATION_TABLE_NEW_COLUMNS.items():
+            if name not in columns:
+                cursor.execute(f"ALTER TABLE simulations ADD COLUMN {name} {type}")
+
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS simulations_simulation_id ON simulations(simulation_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS simulations_status ON simulations(status)"
+        )
+        # version 2: parquet import looks up simulations by expression
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS simulations_expr ON simulations(expr)"
+        )
+
+        cursor.execute(CREATE_CHANGES_TABLE)
+        cursor.execute(CREATE_SIMULATION_INSERT_TRIGGER)
+        cursor.execute(CREATE_SIMULATION_UPDATE_TRIGGER)
+
+    def change_seq(self, status: str) -> int:
+        """
+        Sequence bumped whenever a simulation gets into `status`.
+        """
+        cursor = self._conn.cursor()
+        cursor.execute(
+            "SELECT seq FROM changes WHERE tbl = 'simulations' AND status = ?",
+            (status,),
+        )
+        row = cursor.fetchone()
+        return row[0] if row else 0
 
     def filter(self, status: str = "PENDING"):
         cursor = self._conn.cursor()
         cursor.execute("SELECT * FROM simulations WHERE status = ?", (status,))
+        rows = cursor.fetchall()
+
+        # only terminal simulations are archived
+        if status in ARCHIVE_STATUS and _has_archive(self._conn):
+            cursor.execute(SELECT_ARCHIVE_SIMULATION, (status,))
+            rows.extend(cursor.fetchall())
 
-        for row in cursor.fetchall():
-            yield {
-                "id": row[0],
-                "expr": row[1],
-                "type": row[2],
-                "settings": json.loads(row[3]),
-                "status": row[4],
-                "created_at": row[5],
-                "simulated_at": row[6],
-                "simulation_id": row[7],
-                "completed_at": row[8],
-                "alpha_id": row[9],
-            }
-
-    def start(self, id: int, simulation_id: str):
+        yield from map(SimulationRow, rows)
+
+    def in_flight(self, stale_secs: float | None = None) -> dict:
+        """
+        Number of simulations still running on brain for each account.
+        Simulations started more than `stale_secs` ago are not counted, they
+        are likely done but not collected (no collector running, crashed...).
+        """
+        cursor = self._conn.cursor()
+        cursor.execute(
+            "SELECT account, COUNT(*) FROM simulations WHERE status = 'SIMULATING' AND (:stale IS NULL OR simulated_at >= UNIXEPOCH() - :stale) GROUP BY account",
+            {"stale": stale_secs},
+        )
+        return dict(cursor.fetchall())
+
+    def start(self, id: int, simulation_id: str, account: str | None = None):
         cursor = self._conn.cursor()
         cursor.execute(
-            "UPDATE simulations SET status = 'SIMULATING', simulated_at = UNIXEPOCH(), simulation_id = ? WHERE id = ?",
+            "UPDATE simulations SET status = 'SIMULATING', simulated_at = UNIXEPOCH(), simulation_id = ?, account = ? WHERE id = ?",
             (
                 simulation_id,
+                account,
                 id,
             ),
         )
         self._conn.commit()
 
+        if self._notifier is not None:
+            self._notifier.notify()
+
     def complete(self, id: int, alpha: str):
         cursor = self._conn.cursor()
         cursor.execute(
@@ -150,11 +428,14 @@ class Simulations:
         )
         self._conn.commit()
 
-    def error(self, id: int):
+    def error(self, id: int, reason: str | None = None):
         cursor = self._conn.cursor()
         cursor.execute(
-            "UPDATE simulations SET status = 'ERROR', completed_at = UNIXEPOCH() WHERE id = ?",
-            (id,),
+            "UPDATE simulations SET status = 'ERROR', completed_at = UNIXEPOCH(), reason = ? WHERE id = ?",
+            (
+                reason,
+                id,
+            ),
         )
         self._conn.commit()
 
@@ -173,16 +454,58 @@ CREATE_ALPHA_TABLE = """CREATE TABLE IF NOT EXISTS alphas (
 
 INSERT_ALPHA_TABLE = """INSERT INTO alphas(id, settings, status, grade, stage, is_summary, train, test, checks) VALUES(?,?,?,?,?,?,?,?,?)"""
 
+# save alpha detail response as it is, sqlite splits the json document.
+INSERT_RAW_ALPHA = """INSERT INTO alphas(id, settings, status, grade, stage, is_summary, train, test, checks)
+    SELECT json_extract(doc, '$.id'), json_extract(doc, '$.settings'),
+        json_extract(doc, '$.status'), json_extract(doc, '$.grade'),
+        json_extract(doc, '$.stage'), json_extract(doc, '$.is'),
+        json_extract(doc, '$.train'), json_extract(doc, '$.test'),
+        CASE WHEN EXISTS (
+            SELECT 1 FROM json_each(doc, '$.is.checks')
+            WHERE json_extract(value, '$.result') = 'FAIL'
+        ) THEN 'FAIL' ELSE 'PASS' END
+    FROM (SELECT json(?1) AS doc WHERE json_valid(?1))
+    WHERE json_extract(doc, '$.id') IS NOT NULL
+    RETURNING id"""
+
+
+class AlphaRow(Row):
+    __slots__ = ()
+
+    id = _column(0)
+    settings = _json_column(1)
+    status = _column(2)
+    grade = _column(3)
+    stage = _column(4)
+    is_summary = _json_column(5)
+    train = _json_column(6)
+    test = _json_column(7)
+    checks = _column(8)
+
+    # key of is_summary in brain alpha responses, `is` is a python keyword
+    _aliases = {"is": "is_summary"}
+
 
 class Alphas:
     def __init__(self, conn: sqlite3.Connection):
         self._conn = conn
-        self._init_table()
 
-    def _init_table(self):
-        cursor = self._conn.cursor()
+    @staticmethod
+    def init_table(cursor: sqlite3.Cursor):
         cursor.execute(CREATE_ALPHA_TABLE)
-        self._conn.commit()
+
+    def get(self, alpha_id: str) -> AlphaRow | None:
+        cursor = self._conn.cursor()
+        cursor.execute(
+            "SELECT id, settings, status, grade, stage, is_summary, train, test, checks FROM alphas WHERE id = ?",
+            (alpha_id,),
+        )
+        row = cursor.fetchone()
+        if row is None and _has_archive(self._conn):
+            cursor.execute(SELECT_ARCHIVE_ALPHA, (alpha_id,))
+            row = cursor.fetchone()
+
+        return None if row is None else AlphaRow(row)
 
     def save(self, alpha: dict):
         checks = alpha["is"].get("checks")
@@ -204,3 +527,196 @@ class Alphas:
             ),
         )
         self._conn.commit()
+
+    def save_raw(self, content: bytes | str) -> str | None:
+        """
+        Save alpha detail response body without decoding it, return alpha id.
+        Nothing is saved and None returned if the body is not an alpha.
+        """
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+
+        cursor = self._conn.cursor()
+        cursor.execute(INSERT_RAW_ALPHA, (content,))
+        row = cursor.fetchone()
+        self._conn.commit()
+        return row[0] if row else None
+
+
+# archive tier: terminal simulations and their alphas, text columns compressed.
+ARCHIVE_STATUS = ("COMPLETE", "ERROR")
+
+CREATE_ARCHIVE_SIMULATION_TABLE = """CREATE TABLE IF NOT EXISTS archive.simulations(
+    id INTEGER PRIMARY KEY,
+    expr BLOB NOT NULL,
+    type TEXT NOT NULL,
+    settings BLOB NOT NULL,
+    status TEXT NOT NULL,
+    created_at INTEGER,
+    simulated_at INTEGER,
+    simulation_id TEXT,
+    completed_at INTEGER,
+    alpha_id TEXT,
+    reason TEXT,
+    account TEXT
+)"""
+
+CREATE_ARCHIVE_ALPHA_TABLE = """CREATE TABLE IF NOT EXISTS archive.alphas(
+    id TEXT PRIMARY KEY,
+    settings BLOB,
+    status TEXT,
+    grade TEXT,
+    stage TEXT,
+    is_summary BLOB,
+    train BLOB,
+    test BLOB,
+    checks TEXT
+)"""
+
+SELECT_ARCHIVE_SIMULATION = """SELECT id, decompress(expr), type, decompress(settings), status,
+    created_at, simulated_at, simulation_id, completed_at, alpha_id, reason, account
+    FROM archive.simulations WHERE status = ?"""
+
+SELECT_ARCHIVE_ALPHA = """SELECT id, decompress(settings), status, grade, stage,
+    decompress(is_summary), decompress(train), decompress(test), checks
+    FROM archive.alphas WHERE id = ?"""
+
+CREATE_ALL_SIMULATIONS_VIEW = """CREATE TEMP VIEW IF NOT EXISTS all_simulations AS
+    SELECT id, expr, type, settings, status, created_at, simulated_at,
+        simulation_id, completed_at, alpha_id, reason, account
+    FROM main.simulations
+    UNION ALL
+    SELECT id, decompress(expr), type, decompress(settings), status, created_at,
+        simulated_at, simulation_id, completed_at, alpha_id, reason, account
+    FROM archive.simulations"""
+
+CREATE_ALL_ALPHAS_VIEW = """CREATE TEMP VIEW IF NOT EXISTS all_alphas AS
+    SELECT id, settings, status, grade, stage, is_summary, train, test, checks
+    FROM main.alphas
+    UNION ALL
+    SELECT id, decompress(settings), status, grade, stage, decompress(is_summary),
+        decompress(train), decompress(test), checks
+    FROM archive.alphas"""
+
+# simulations are archived in batches of ids, keeping each transaction short.
+# the newest simulation is never archived, otherwise sqlite may reuse its id.
+SELECT_ARCHIVABLE_SIMULATIONS = """SELECT id FROM main.simulations
+    WHERE status IN ('COMPLETE', 'ERROR') AND completed_at < ?
+        AND id < (SELECT MAX(id) FROM main.simulations)
+    ORDER BY id LIMIT ?"""
+
+ARCHIVE_SIMULATIONS = """INSERT INTO archive.simulations
+    SELECT id, compress(expr), type, compress(settings), status, created_at,
+        simulated_at, simulation_id, completed_at, alpha_id, reason, account
+    FROM main.simulations WHERE id IN (SELECT value FROM json_each(?))"""
+
+ARCHIVE_ALPHAS = """INSERT OR IGNORE INTO archive.alphas
+    SELECT id, compress(settings), status, grade, stage, compress(is_summary),
+        compress(train), compress(test), checks
+    FROM main.alphas WHERE id IN (
+        SELECT alpha_id FROM main.simulations WHERE id IN (SELECT value FROM json_each(?))
+    )"""
+
+DELETE_ARCHIVED_ALPHAS = """DELETE FROM main.alphas WHERE id IN (
+    SELECT alpha_id FROM main.simulations WHERE id IN (SELECT value FROM json_each(?))
+)"""
+
+DELETE_ARCHIVED_SIMULATIONS = (
+    "DELETE FROM main.simulations WHERE id IN (SELECT value FROM json_each(?))"
+)
+
+# codec tag prefixed to every compressed value
+ZLIB_CODEC = b"z"
+ZSTD_CODEC = b"s"
+CODECS = {"zlib": ZLIB_CODEC, "zstd": ZSTD_CODEC}
+
+
+def compress(text: str | None, codec: bytes = ZLIB_CODEC) -> bytes | None:
+    if text is None:
+        return None
+
+    data = text.encode("utf-8")
+    if codec == ZSTD_CODEC:
+        return ZSTD_CODEC + zstd.compress(data)
+    return ZLIB_CODEC + zlib.compress(data, 9)
+
+
+def decompress(blob: bytes | str | None) -> str | None:
+    if blob is None or isinstance(blob, str):
+        return blob
+
+    codec, data = blob[:1], blob[1:]
+    if codec == ZLIB_CODEC:
+        return zlib.decompress(data).decode("utf-8")
+    if codec == ZSTD_CODEC:
+        if zstd is None:
+            raise RuntimeError("zstd archive needs python 3.14 or later")
+        return zstd.decompress(data).decode("utf-8")
+    raise ValueError("unknown archive codec: {!r}".format(codec))
+
+
+def _has_archive(conn: sqlite3.Connection) -> bool:
+    return any(row[1] == "archive" for row in conn.execute("PRAGMA database_list"))
+
+
+class Archive:
+    """
+    Rows are compressed with `codec`. zlib is the default, zstd needs python
+    3.14+ to write and to read back, every python reading the archive must
+    have it.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, codec: str = "zlib"):
+        if codec not in CODECS:
+            raise ValueError(f"unknown archive codec: {codec}")
+        if codec == "zstd" and zstd is None:
+            raise RuntimeError("zstd archive needs python 3.14 or later")
+
+        self._conn = conn
+        # rows moved by this archive use its codec
+        conn.create_function(
+            "compress",
+            1,
+            functools.partial(compress, codec=CODECS[codec]),
+            deterministic=True,
+        )
+
+    @staticmethod
+    def init_table(cursor: sqlite3.Cursor):
+        cursor.execute(CREATE_ARCHIVE_SIMULATION_TABLE)
+        cursor.execute(CREATE_ARCHIVE_ALPHA_TABLE)
+
+    def move(self, before: int, batch_size: int = 1000) -> (int, int):
+        """
+        Move terminal simulations completed before unix time `before`, and
+        their alphas, into the archive DB. Return numbers of moved rows.
+        """
+        cursor = self._conn.cursor()
+        simulations, alphas = 0, 0
+        while True:
+            cursor.execute(SELECT_ARCHIVABLE_SIMULATIONS, (before, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            ids = json.dumps([row[0] for row in rows])
+
+            try:
+                cursor.execute(ARCHIVE_SIMULATIONS, (ids,))
+                simulations += cursor.rowcount
+                cursor.execute(ARCHIVE_ALPHAS, (ids,))
+                cursor.execute(DELETE_ARCHIVED_ALPHAS, (ids,))
+                alphas += cursor.rowcount
+                cursor.execute(DELETE_ARCHIVED_SIMULATIONS, (ids,))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+        return simulations, alphas
+
+    def vacuum(self):
+        """
+        Give space of moved rows back to the file system.
+        """
+        self._conn.execute("VACUUM main")
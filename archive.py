@@ -0,0 +1,55 @@
+import argparse
+import sys
+import time
+
+from alpha_db import AlphaDB
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move old completed simulations and alphas to a compressed archive DB."
+    )
+    parser.add_argument("--db", default="alpha.db", help="sqlite db to archive.")
+    parser.add_argument(
+        "--archive",
+        default=None,
+        help="archive sqlite db. default to `<db name>.archive.db` next to db.",
+    )
+    parser.add_argument(
+        "--days",
+        default=30,
+        type=float,
+        help="archive simulations completed more than given days ago.",
+    )
+    parser.add_argument(
+        "--batch_size",
+        default=1000,
+        type=int,
+        help="simulations moved per transaction.",
+    )
+    parser.add_argument(
+        "--codec",
+        default="zlib",
+        choices=("zlib", "zstd"),
+        help="compression of archived rows. zstd is smaller and faster but "
+        "needs python 3.14+ everywhere the archive is read.",
+    )
+    parser.add_argument(
+        "--vacuum", action="store_true", help="vacuum db after archiving to shrink it."
+    )
+
+    args = parser.parse_args(sys.argv[1:])
+
+    before = int(time.time() - args.days * 86400)
+
+    with AlphaDB(args.db, args.archive) as db:
+        archive = db.archive(args.codec)
+        simulations, alphas = archive.move(before, args.batch_size)
+        print(f"{simulations} simulations and {alphas} alphas archived.")
+
+        if args.vacuum:
+            archive.vacuum()
+
+
+if __name__ == "__main__":
+    main()
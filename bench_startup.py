@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(code: str):
+    return lambda: subprocess.run([sys.executable, "-c", code], cwd=HERE, check=True)
+
+
+def bench_imports(repeat: int):
+    """
+    Fresh interpreter importing each command, against an empty interpreter.
+    """
+    base = median_ms(run("pass"), repeat)
+    print(f"{'python -c pass':<28} {base:8.1f} ms")
+    for module in ("brain", "alpha_db", "crawl", "simulate", "collect"):
+        ms = median_ms(run(f"import {module}"), repeat)
+        print(f"{'import ' + module:<28} {ms:8.1f} ms  (+{ms - base:.1f})")
+
+    ms = median_ms(run("import requests"), repeat)
+    print(f"{'import requests (deferred)':<28} {ms:8.1f} ms  (+{ms - base:.1f})")
+
+
+def bench_db(repeat: int):
+    """
+    Open an existing DB and get every accessor, as each command does.
+    """
+    from alpha_db import AlphaDB
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dbfile = os.path.join(tmp, "alpha.db")
+
+        def first():
+            with AlphaDB(dbfile) as db:
+                db.fields(), db.simulations(), db.alphas()
+
+        print(f"{'create db schema':<28} {median_ms(first, 1):8.1f} ms")
+        print(f"{'open db + accessors':<28} {median_ms(first, repeat):8.1f} ms")
+
+
+def bench_session(repeat: int):
+    """
+    Connect with a cached session in a fresh interpreter, as a command does
+    before its first request: it pays the deferred `import requests`. No
+    request is made.
+    """
+    import brain
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = brain.SessionCache(tmp, "bench")
+        os.makedirs(tmp, exist_ok=True)
+        with open(cache.path, "w") as f:
+            json.dump(
+                {
+                    "expires_at": time.time() + 3600,
+                    "cookies": [
+                        {
+                            "name": "t",
+                            "value": "x" * 200,
+                            "domain": "api.worldquantbrain.com",
+                            "path": "/",
+                            "expires": None,
+                            "secure": True,
+                        }
+                    ],
+                },
+                f,
+            )
+
+        base = median_ms(run("import brain"), repeat)
+        connect = (
+            f"import brain; brain.Client('bench', '', session_dir={tmp!r}).connect()"
+        )
+        ms = median_ms(run(connect), repeat)
+        print(
+            f"{'connect (cached session)':<28} {ms:8.1f} ms  (+{ms - base:.1f} over import brain)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure time spent before the first useful request."
+    )
+    parser.add_argument("--repeat", default=10, type=int, help="runs of each case.")
+
+    args = parser.parse_args(sys.argv[1:])
+
+    sys.path.insert(0, HERE)
+    bench_imports(args.repeat)
+    bench_db(args.repeat)
+    bench_session(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
+from __future__ import annotations
+
 import time
 import os
 import sys
 import json
-import requests
+import hashlib
 
+from typing import TYPE_CHECKING
 from urllib.parse import urljoin
 
+from concurrency import ConcurrencyController
+from retry import FAIL, RAISE, RETRY, CircuitBreaker, RetryBudget, RetryPolicy
+
+# requests takes longer to import than short commands run, import it when a
+# request is made.
+if TYPE_CHECKING:
+    import requests
+
 WQB_API = "https://api.worldquantbrain.com/"
 RETRY_TIMES = 3
+CONCURRENT_LIMIT_ERROR = "CONCURRENT_SIMULATION_LIMIT_EXCEEDED"
+SESSION_TTL = 3600.0  # assumed session lifetime when server does not tell
+SESSION_TTL_MARGIN = 60.0  # do not reuse a session about to expire
 
 
 class BrainError(Exception):
@@ -28,55 +42,240 @@ class NetworkError(BrainError):
         return "network error: {}".format(self.inner)
 
 
+class OutcomeUnknownError(BrainError):
+    """
+    A non idempotent request failed after it may have reached the server,
+    sending it again could apply it twice.
+    """
+
+    def __init__(self, cause):
+        self.inner = cause
+
+    def __str__(self):
+        return "request may have been applied: {}".format(self.inner)
+
+
 class AuthenticationError(BrainError):
     def __str__(self):
         return "API authentication fail."
 
 
+def retry_after(resp: requests.Response) -> float | None:
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def is_concurrency_limited(resp: requests.Response) -> bool:
+    return resp.status_code == 429 and CONCURRENT_LIMIT_ERROR in resp.text
+
+
+def default_session_dir() -> str:
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.environ.get("WQB_SESSION_DIR") or os.path.join(cache, "worldquant")
+
+
+class SessionCache:
+    """
+    Authenticated session cookies of an account saved across runs, so short
+    commands skip authentication until the session expires.
+    """
+
+    def __init__(self, directory: str, user: str):
+        name = hashlib.sha256(user.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(directory, f"{name}.json")
+
+    def load(self, session: requests.Session) -> bool:
+        try:
+            with open(self.path) as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if content.get("expires_at", 0) - SESSION_TTL_MARGIN < time.time():
+            return False
+
+        for cookie in content.get("cookies", []):
+            session.cookies.set(**cookie)
+        return True
+
+    def save(self, session: requests.Session, expires_at: float):
+        cookies = [
+            {
+                "name": c.name,
+                "value": c.value,
+                "domain": c.domain,
+                "path": c.path,
+                "expires": c.expires,
+                "secure": c.secure,
+            }
+            for c in session.cookies
+        ]
+
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"expires_at": expires_at, "cookies": cookies}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # cache is best effort
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def session_expires_at(resp: requests.Response) -> float:
+    """
+    Session expiry from authentication response: token expiry in the body,
+    else the earliest cookie expiry, else SESSION_TTL from now.
+    """
+    now = time.time()
+    try:
+        return now + float(resp.json()["token"]["expiry"])
+    except (ValueError, KeyError, TypeError):
+        pass
+
+    expires = [c.expires for c in resp.cookies if c.expires]
+    return min(expires) if expires else now + SESSION_TTL
+
+
 class Client:
     def __init__(self, user, password, **kwargs):
         self._user = user
         self._pass = password
         self._session = None
-        self._retry_times = kwargs.get("retry_times", RETRY_TIMES)
+        session_dir = kwargs.get("session_dir", default_session_dir())
+        self._session_cache = (
+            SessionCache(session_dir, user) if session_dir is not None else None
+        )
+        self.retry_policy = kwargs.get("retry_policy") or RetryPolicy(
+            max_attempts=kwargs.get("retry_times", RETRY_TIMES) + 1
+        )
+        # budget and breaker may be shared by clients of the same API
+        self.retry_budget = kwargs.get("retry_budget") or RetryBudget()
+        self.breaker = kwargs.get("breaker") or CircuitBreaker()
+        # pauses all requests of the client on 429, its limit is not used:
+        # requests of a client are sent one at a time
+        self.controller = kwargs.get("controller") or ConcurrencyController()
 
     def connect(self):
-        self._session = requests.Session()
+        import requests
+
+        if self._session is None:
+            self._session = requests.Session()
+            cache = self._session_cache
+            if cache is not None and cache.load(self._session):
+                return
+        self._authenticate()
+
+    def _authenticate(self):
+        """
+        Refresh credential cookies of the current session, pooled connections
+        are kept.
+        """
+        import requests
 
         req = requests.Request(
             method="POST",
             url=urljoin(WQB_API, "authentication"),
             auth=requests.auth.HTTPBasicAuth(self._user, self._pass),
-        ).prepare()
+        )
 
         try:
-            resp = self._session.send(req)
+            resp = self._session.send(
+                self._session.prepare_request(req), timeout=self.retry_policy.timeout
+            )
         except Exception as e:
             raise NetworkError(e)
-        else:
-            if not resp.ok:
-                raise AuthenticationError
+
+        if not resp.ok:
+            if self._session_cache is not None:
+                self._session_cache.clear()
+            raise AuthenticationError
+
+        if self._session_cache is not None:
+            self._session_cache.save(self._session, session_expires_at(resp))
+
+    @property
+    def user(self) -> str:
+        return self._user
 
     def send(self, req: requests.Request) -> requests.Response:
         if not self._session:
             self.connect()
-        return self._send(req, self._retry_times)
 
-    def _send(self, req: requests.Request, retry_times: int = 0) -> requests.Response:
-        try:
-            s = self._session
-            resp = s.send(s.prepare_request(req))
+        self.controller.wait()
+        resp = self._send(req)
+
+        # too many running simulations is not request throttling, it is
+        # handled by the caller
+        if resp.status_code == 429 and not is_concurrency_limited(resp):
+            self.controller.on_throttle(retry_after(resp))
+        elif resp.ok:
+            self.controller.on_success()
+
+        return resp
+
+    def _send(self, req: requests.Request) -> requests.Response:
+        policy = self.retry_policy
+        attempt, reauth = 0, 0
+        self.retry_budget.deposit()
+
+        while True:
+            self.breaker.wait()
+            attempt += 1
+
+            # every attempt reports to the breaker, a half open breaker
+            # waits for the probe's outcome
+            try:
+                s = self._session
+                resp = s.send(s.prepare_request(req), timeout=policy.timeout)
+            except Exception as e:
+                self.breaker.record_failure()
+                action = policy.classify_exception(e, req.method)
+                if action == RAISE:
+                    raise
+                if action == FAIL:
+                    if policy.maybe_applied(e, req.method):
+                        raise OutcomeUnknownError(e)
+                    raise NetworkError(e)
+
+                if not policy.can_retry(attempt) or not self.retry_budget.withdraw():
+                    raise NetworkError(e)
+
+                time.sleep(policy.delay(attempt))
+                continue
+
+            # server errors count against the breaker whether the method
+            # allows a retry or not
+            if resp.status_code in policy.retry_statuses:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            if policy.classify_status(resp.status_code, req.method) == RETRY:
+                if not policy.can_retry(attempt) or not self.retry_budget.withdraw():
+                    return resp
+
+                time.sleep(policy.delay(attempt, retry_after(resp)))
+                continue
+
             if resp.status_code == 401:
-                self.connect()
-                return self._send(req, retry_times=retry_times - 1)
+                # expired credential, not a failure of the attempt
+                if reauth >= policy.max_reauth:
+                    raise AuthenticationError
+                reauth += 1
+                attempt -= 1
+                self._authenticate()
+                continue
+
             return resp
-        except AuthenticationError as e:
-            raise e
-        except Exception as e:
-            if retry_times <= 0:
-                raise NetworkError(e)
-            else:
-                return self._send(req, retry_times=retry_times - 1)
 
     def data_fields(self):
         return DataFields(self)
@@ -88,6 +287,142 @@ class Client:
         return SimulationResult(self, simulation_id)
 
 
+def load_accounts(path: str) -> [tuple]:
+    """
+    Read accounts file, one account per line: `user password [max_simulations]`.
+    Empty lines and lines start with `#` are ignored. Without max_simulations,
+    the limit is learnt from the server.
+    """
+    accounts = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = line.split()
+            if len(parts) not in (2, 3):
+                raise ValueError(f"{path}:{lineno}: expect `user password [max]`")
+
+            user, password = parts[0], parts[1]
+            max_simulations = int(parts[2]) if len(parts) == 3 else None
+            accounts.append((user, password, max_simulations))
+
+    return accounts
+
+
+class ClientPool:
+    """
+    Authenticated clients of several accounts. Simulations are routed to the
+    account with most free simulation slots, each account's number of slots
+    is managed by its own ConcurrencyController.
+    """
+
+    def __init__(self, accounts: [tuple], **kwargs):
+        if not accounts:
+            raise ValueError("client pool needs at least one account")
+
+        # all accounts talk to the same API, an outage pauses them all
+        kwargs.setdefault("retry_budget", RetryBudget())
+        kwargs.setdefault("breaker", CircuitBreaker())
+
+        self._clients = {}
+        self._controllers = {}
+        for account in accounts:
+            user, password = account[0], account[1]
+            maximum = account[2] if len(account) > 2 else None
+            self._clients[user] = Client(user, password, **kwargs)
+            self._controllers[user] = ConcurrencyController(maximum=maximum)
+
+        self._default = next(iter(self._clients))
+        self._disabled = set()
+
+    @property
+    def users(self) -> [str]:
+        """
+        Accounts still usable, see `disable`.
+        """
+        return [user for user in self._clients if user not in self._disabled]
+
+    def disable(self, user: str):
+        """
+        Take an account out of rotation, after its authentication failed.
+        """
+        self._disabled.add(user)
+
+    def client(self, user: str | None = None) -> Client | None:
+        """
+        Client of the given account, the first account if user is None
+        (simulations started before accounts were recorded). None if the
+        account is not in the pool or disabled, no other account may read
+        its simulations.
+        """
+        owner = self.owner(user)
+        if owner is None or owner in self._disabled:
+            return None
+        return self._clients[owner]
+
+    def controller(self, user: str | None = None) -> ConcurrencyController:
+        return self._controllers[self.owner(user)]
+
+    def owner(self, user: str | None) -> str | None:
+        if user is None:
+            return self._default
+        return user if user in self._clients else None
+
+    def in_flight(self, running: dict) -> dict:
+        """
+        Running simulations of every account in the pool, `running` maps
+        recorded account to its running simulations. Simulations of accounts
+        out of the pool take none of its slots.
+        """
+        counts = {user: 0 for user in self._clients}
+        for user, count in running.items():
+            owner = self.owner(user)
+            if owner is not None:
+                counts[owner] += count
+        return counts
+
+    def full(self, running: dict) -> bool:
+        """
+        True if every usable account runs as many simulations as it may.
+        """
+        counts = self.in_flight(running)
+        return all(
+            counts[user] >= self._controllers[user].capacity for user in self.users
+        )
+
+    def acquire(self, running: dict) -> Client | None:
+        """
+        Pick the client with most free slots among accounts ready to send.
+        """
+        counts = self.in_flight(running)
+        ready = []
+        for user in self.users:
+            ctl = self._controllers[user]
+            if ctl.has_capacity(counts[user]):
+                ready.append((ctl.capacity - counts[user], user))
+
+        if not ready:
+            return None
+
+        _, user = max(ready)
+        return self._clients[user]
+
+    def wait_secs(self, running: dict, idle_secs: float = 5.0) -> float:
+        """
+        Seconds until an account may be ready. when all slots are taken, wait
+        `idle_secs` for running simulations to complete.
+        """
+        counts = self.in_flight(running)
+        waits = [
+            self._controllers[user].wait_secs()
+            for user in self.users
+            if counts[user] < self._controllers[user].capacity
+        ]
+        return min(waits) if waits else idle_secs
+
+
 class DataField:
     def __init__(self, response_dict: dict):
         self._content = response_dict
@@ -157,6 +492,8 @@ class DataFields:
         return self
 
     def iter(self):
+        import requests
+
         url = urljoin(WQB_API, "data-fields")
         count = 0
         query = self._filter.copy()
@@ -185,6 +522,41 @@ class SimulationAPIError(BrainError):
     def __init__(self, resp: requests.Response):
         self.resp = resp
 
+    @property
+    def concurrency_limited(self) -> bool:
+        return is_concurrency_limited(self.resp)
+
+    @property
+    def throttled(self) -> bool:
+        return self.resp.status_code == 429 and not self.concurrency_limited
+
+    @property
+    def retry_after(self) -> float | None:
+        return retry_after(self.resp)
+
+    @property
+    def retryable(self) -> bool:
+        """
+        Throttling and unavailability may succeed later, the simulation was
+        surely not started. Other server errors may have started it, other
+        4xx responses (bad expression, unknown field...) never will.
+        """
+        code = self.resp.status_code
+        return code == 429 or code == 503
+
+    @property
+    def reason(self) -> str:
+        try:
+            content = self.resp.json()
+        except ValueError:
+            return self.resp.text
+
+        if isinstance(content, dict):
+            for key in ("message", "detail", "error"):
+                if key in content:
+                    return str(content[key])
+        return json.dumps(content)
+
     def __str__(self):
         return "simulation api: response code, {}. error: {}".format(
             self.resp.status_code, self.resp.text
@@ -270,11 +642,17 @@ class Simulation:
 
         return self
 
+    @property
+    def settings(self) -> dict:
+        return self._sim["settings"]
+
     def with_expr(self, expr: str):
         self._sim["regular"] = expr
         return self
 
     def send(self):
+        import requests
+
         req = requests.Request(
             method="POST",
             url=urljoin(WQB_API, "simulations"),
@@ -282,12 +660,20 @@ class Simulation:
         )
 
         resp = self._cli.send(req)
+        if resp.status_code >= 500 and resp.status_code != 503:
+            # a gateway timeout or crash after the simulation was created
+            raise OutcomeUnknownError(
+                "response code {}, {}".format(resp.status_code, resp.text)
+            )
         if not resp.ok:
             raise SimulationAPIError(resp)
 
         simulation_id = os.path.basename(resp.headers["Location"])
 
-        return SimulationResult(self._cli, simulation_id)
+        result = SimulationResult(self._cli, simulation_id)
+        # time of the accepted attempt only, without retries and pauses
+        result.latency = resp.elapsed.total_seconds()
+        return result
 
 
 class SimulationResultAPIError(BrainError):
@@ -302,11 +688,14 @@ class SimulationResult:
     def __init__(self, cli: Client, simulation_id: str):
         self._cli = cli
         self.simulation_id = simulation_id
+        self.latency = None  # seconds the simulation request took
         self.alpha = None
         self.default_retry_after = 1.0  # default check period
         self.max_fail_times = 3  # max fail times
 
     def wait(self):
+        import requests
+
         fail_times = 0
         while True:
             req = requests.Request("GET", f"{WQB_API}/simulations/{self.simulation_id}")
@@ -341,7 +730,12 @@ class SimulationResult:
             self.alpha = result["alpha"]
             return self
 
-    def detail(self):
+    def detail(self, raw: bool = False):
+        """
+        Alpha detail, the undecoded response body if raw is True.
+        """
+        import requests
+
         if self.alpha is None:
             raise SimulationResultAPIError(
                 "wait method should be called before detail method"
@@ -350,7 +744,7 @@ class SimulationResult:
         req = requests.Request("GET", f"{WQB_API}/alphas/{self.alpha}")
         resp = self._cli.send(req)
         if resp.ok:
-            return resp.json()
+            return resp.content if raw else resp.json()
 
         raise SimulationResultAPIError(
             "api error response, code: {}, content: {}".format(
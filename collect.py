@@ -1,53 +1,95 @@
 import argparse
 import os
+import signal
 import sys
-import time
 
 import brain
 
 from alpha_db import AlphaDB
 
 
-def fetch_results(db: AlphaDB, cli: brain.Client):
+def fetch_results(db: AlphaDB, pool: brain.ClientPool, limit: int, idle_secs: float):
     simulations = db.simulations()
     alphas = db.alphas()
 
-    succ, fail, wait_sec = 0, 0, 1.0
+    succ, fail = 0, 0
+    stopping = False
 
     def print_info(msg: str, file=sys.stdout):
         print(
             f"[\33[0;32m{succ:0>4}\033[0m|\33[0;31m{fail:0>4}\033[0m] {msg}", file=file
         )
 
-    while True:
-        is_empty = True
-        for row in simulations.filter(status="SIMULATING"):
-            try:
-                is_empty = False
-
-                alpha = cli.simulation_result(row["simulation_id"]).wait().detail()
-                alphas.save(alpha)
-                simulations.complete(row["id"], alpha["id"])
-
-                succ += 1
-                print_info(f"New alpha: {alpha['id']}")
-            except brain.BrainError as e:
-                simulations.error(row["id"])
-                fail += 1
-                print_info(
-                    f"Simulation: {row['simulation_id']}, Error: {str(e)}", sys.stderr
-                )
-
-        if is_empty:
-            wait_sec = wait_sec * 2 if wait_sec < 5.0 else wait_sec
-        else:
-            wait_sec = wait_sec / 3.0 if wait_sec > 1.0 else 1.0
-
-        print_info(f"Rescan after {wait_sec:.2f} secs.")
-
-        time.sleep(wait_sec)
-
-        print_info("Rescan...")
+    with db.listener() as listener:
+
+        def stop(signum, frame):
+            nonlocal stopping
+            if stopping:
+                raise KeyboardInterrupt
+            stopping = True
+            print_info("Stopping after current simulation, again to abort.")
+            listener.wake()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        last_seq = None
+        skipped = set()  # accounts whose simulations are not polled
+        while not stopping:
+            # rows only get into SIMULATING with the sequence bumped, no
+            # need to rescan the table when it did not change
+            seq = simulations.change_seq("SIMULATING")
+            if seq == last_seq:
+                print_info("Waiting for new simulations.")
+                while not listener.wait(idle_secs) and not stopping:
+                    if simulations.change_seq("SIMULATING") != last_seq:
+                        break
+                continue
+
+            last_seq = seq
+            for row in simulations.filter(status="SIMULATING"):
+                if stopping:
+                    break
+
+                cli = pool.client(row.account)
+                if cli is None:
+                    # polling with another account fails and loses the result
+                    if row.account not in skipped:
+                        skipped.add(row.account)
+                        print_info(
+                            f"Skip simulations of account {row.account}, "
+                            "not in accounts or authentication failed.",
+                            sys.stderr,
+                        )
+                    continue
+
+                try:
+                    result = cli.simulation_result(row.simulation_id).wait()
+                    alpha_id = alphas.save_raw(result.detail(raw=True))
+                    if alpha_id is None:
+                        raise brain.SimulationResultAPIError(
+                            f"alpha {result.alpha} detail without id"
+                        )
+                    simulations.complete(row.id, alpha_id)
+
+                    succ += 1
+                    print_info(f"New alpha: {alpha_id}")
+                except brain.AuthenticationError as e:
+                    # the simulation is fine, its account is not
+                    pool.disable(cli.user)
+                    print_info(f"Account {cli.user} disabled: {e}", sys.stderr)
+                    if not pool.users:
+                        raise
+                except brain.BrainError as e:
+                    simulations.error(row.id, str(e))
+                    fail += 1
+                    print_info(
+                        f"Simulation: {row.simulation_id}, Error: {str(e)}",
+                        sys.stderr,
+                    )
+
+                if limit != 0 and succ >= limit:
+                    return
 
 
 def main():
@@ -62,23 +104,39 @@ def main():
         default=os.environ.get("WQB_PASS"),
         help="Brain API password. use env WQB_PASS if not given.",
     )
+    parser.add_argument(
+        "--accounts",
+        default=os.environ.get("WQB_ACCOUNTS"),
+        help="file of Brain API accounts, one `user password [max_simulations]` each line. "
+        "use env WQB_ACCOUNTS if not given, --user and --password are ignored if set.",
+    )
     parser.add_argument(
         "--db", default="alpha.db", help="sqlite db that store all alphas."
     )
     parser.add_argument(
         "--limit", default=0, type=int, help="max number of alphas to get."
     )
+    parser.add_argument(
+        "--idle",
+        default=60.0,
+        type=float,
+        help="seconds between checks for new simulations when not notified.",
+    )
 
     args = parser.parse_args(sys.argv[1:])
 
-    if not args.user or not args.password:
+    if args.accounts:
+        accounts = brain.load_accounts(args.accounts)
+    elif args.user and args.password:
+        accounts = [(args.user, args.password)]
+    else:
         print("no user or password found.", file=sys.stderr)
         sys.exit(1)
 
-    cli = brain.Client(args.user, args.password)
+    pool = brain.ClientPool(accounts)
 
     with AlphaDB(args.db) as db:
-        fetch_results(db, cli)
+        fetch_results(db, pool, args.limit, args.idle)
 
 
 if __name__ == "__main__":
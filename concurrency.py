@@ -0,0 +1,195 @@
+import math
+import time
+
+from collections import deque
+
+MAX_COOLDOWN = 60.0
+
+
+class Decision:
+    __slots__ = ("at", "event", "old_limit", "new_limit", "note")
+
+    def __init__(self, event: str, old_limit: float, new_limit: float, note: str):
+        self.at = time.time()
+        self.event = event
+        self.old_limit = old_limit
+        self.new_limit = new_limit
+        self.note = note
+
+    def __repr__(self):
+        return "{}: {:.2f} -> {:.2f} {}".format(
+            self.event, self.old_limit, self.new_limit, self.note
+        )
+
+
+class ConcurrencyController:
+    """
+    AIMD controller of work in flight (running simulations, requests...).
+
+    The limit grows by one per success until the first congestion signal
+    (slow start), then by 1/limit per success. A concurrency limit response
+    sets it to what was in flight, which is the server's limit, instead of
+    cutting it; the limit is probed again only after `probe_after` successes
+    at it, and forgotten after `probe_after` successes one above it, the
+    server raised it. Throttling (429) halves it and pauses all sends for
+    Retry-After or an exponential cooldown. Average latency above
+    `latency_tolerance` times the best of the last `latency_window` ones
+    stops growth and shrinks it slowly. Other
+    errors (network, auth, bad request) only pause sending, they say nothing
+    about congestion.
+    """
+
+    def __init__(
+        self,
+        initial: float = 1.0,
+        minimum: float = 1.0,
+        maximum: float | None = None,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        latency_window: int = 50,
+        cooldown: float = 1.0,
+        probe_after: int = 100,
+        history: int = 100,
+    ):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.probe_after = probe_after
+
+        self.slow_start = True
+        self.server_limit = None  # last concurrency limit reported by server
+        self.successes_at_limit = 0
+        self.successes_at_probe = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.avg_latency = None
+        self.throttle_streak = 0
+        self.error_streak = 0
+        self.paused_until = 0.0
+        self.decisions = deque(maxlen=history)
+
+    @property
+    def min_latency(self) -> float | None:
+        # over a window, an old lucky response does not set the bar forever
+        return min(self.latencies) if self.latencies else None
+
+    @property
+    def capacity(self) -> int:
+        return max(int(math.floor(self.limit)), 1)
+
+    def has_capacity(self, in_flight: int) -> bool:
+        return in_flight < self.capacity and self.wait_secs() == 0.0
+
+    def wait_secs(self) -> float:
+        return max(self.paused_until - time.monotonic(), 0.0)
+
+    def wait(self):
+        time.sleep(self.wait_secs())
+
+    def state(self) -> dict:
+        return {
+            "limit": self.limit,
+            "capacity": self.capacity,
+            "slow_start": self.slow_start,
+            "server_limit": self.server_limit,
+            "successes_at_limit": self.successes_at_limit,
+            "successes_at_probe": self.successes_at_probe,
+            "min_latency": self.min_latency,
+            "avg_latency": self.avg_latency,
+            "throttle_streak": self.throttle_streak,
+            "error_streak": self.error_streak,
+            "wait_secs": self.wait_secs(),
+        }
+
+    def _ceiling(self) -> float:
+        ceiling = math.inf if self.maximum is None else float(self.maximum)
+        if self.server_limit is not None:
+            # probe one above the known limit now and then, it may be raised
+            probe = 1.0 if self.successes_at_limit >= self.probe_after else 0.0
+            ceiling = min(ceiling, self.server_limit + probe)
+        return ceiling
+
+    def _set_limit(self, event: str, limit: float, note: str = ""):
+        limit = min(max(limit, self.minimum), self._ceiling())
+        if limit != self.limit:
+            self.decisions.append(Decision(event, self.limit, limit, note))
+        self.limit = limit
+
+    def _pause(self, secs: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + secs)
+
+    def on_success(self, latency: float | None = None):
+        self.throttle_streak = 0
+        self.error_streak = 0
+
+        if latency is not None:
+            self.latencies.append(latency)
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+
+            if self.avg_latency > self.latency_tolerance * self.min_latency:
+                self.slow_start = False
+                self._set_limit(
+                    "latency",
+                    self.limit * 0.9,
+                    f"avg {self.avg_latency:.2f}s, min {self.min_latency:.2f}s",
+                )
+                return
+
+        if self.server_limit is not None:
+            if self.capacity > self.server_limit:
+                self.successes_at_probe += 1
+            elif self.limit >= self.server_limit:
+                self.successes_at_limit += 1
+
+            if self.successes_at_probe >= self.probe_after:
+                # the probe held, grow again until the next limit response
+                self.decisions.append(
+                    Decision(
+                        "probe",
+                        self.limit,
+                        self.limit,
+                        f"server limit {self.server_limit} raised",
+                    )
+                )
+                self.server_limit = None
+                self.successes_at_limit = 0
+                self.successes_at_probe = 0
+
+        step = 1.0 if self.slow_start else 1.0 / self.limit
+        self._set_limit("increase", self.limit + step)
+
+    def on_limit(self, in_flight: int):
+        """
+        Server refused for too many concurrent works, `in_flight` is its limit.
+        """
+        self.slow_start = False
+        self.server_limit = max(in_flight, 1)
+        self.successes_at_limit = 0
+        self.successes_at_probe = 0
+        self._set_limit("limit", float(self.server_limit), f"server limit {in_flight}")
+
+    def on_throttle(self, retry_after: float | None = None):
+        self.slow_start = False
+        self.throttle_streak += 1
+
+        if retry_after is None:
+            retry_after = min(
+                self.cooldown * 2 ** (self.throttle_streak - 1), MAX_COOLDOWN
+            )
+        self._pause(retry_after)
+        self._set_limit(
+            "throttle", self.limit * self.decrease, f"pause {retry_after:.2f}s"
+        )
+
+    def on_error(self, err: Exception | None = None):
+        self.error_streak += 1
+        secs = min(self.cooldown * 2 ** (self.error_streak - 1), MAX_COOLDOWN)
+        self._pause(secs)
+        self.decisions.append(
+            Decision("error", self.limit, self.limit, f"pause {secs:.2f}s: {err}")
+        )
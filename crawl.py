@@ -97,6 +97,10 @@ def main():
         fields = db.fields()
         fields.insert_many(field_list)
 
+        # only a full crawl lets simulate.py reject unknown fields
+        if args.type is None and args.dataset_id is None and args.limit is None:
+            fields.crawled(args.region, args.universe, args.delay)
+
     print(f"{len(field_list)} fields imported.")
 
 
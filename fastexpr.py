@@ -0,0 +1,450 @@
+import re
+
+# FASTEXPR operators: name -> (min args, max positional args, keyword args)
+# max of None means variadic. keyword args may also give positional ones, like
+# `lookback` of ts_backfill. the list is not complete, calls of an operator or
+# keyword not listed here are left to brain to check.
+OPERATORS = {
+    # arithmetic
+    "abs": (1, 1, ()),
+    "add": (2, None, ("filter",)),
+    "subtract": (2, 2, ("filter",)),
+    "multiply": (2, None, ("filter",)),
+    "divide": (2, 2, ()),
+    "inverse": (1, 1, ()),
+    "log": (1, 1, ()),
+    "exp": (1, 1, ()),
+    "floor": (1, 1, ()),
+    "ceiling": (1, 1, ()),
+    "round": (1, 1, ()),
+    "round_down": (1, 1, ("f",)),
+    "fraction": (1, 1, ()),
+    "log_diff": (1, 1, ()),
+    "nan_mask": (2, 2, ()),
+    "max": (2, None, ()),
+    "min": (2, None, ()),
+    "power": (2, 2, ()),
+    "signed_power": (2, 2, ()),
+    "reverse": (1, 1, ()),
+    "sign": (1, 1, ()),
+    "sqrt": (1, 1, ()),
+    "s_log_1p": (1, 1, ()),
+    "densify": (1, 1, ()),
+    "to_nan": (1, 1, ("value", "reverse")),
+    "pasteurize": (1, 1, ()),
+    "purify": (1, 1, ()),
+    # logical
+    "and": (2, 2, ()),
+    "or": (2, 2, ()),
+    "not": (1, 1, ()),
+    "if_else": (3, 3, ()),
+    "is_nan": (1, 1, ()),
+    "trade_when": (3, 3, ()),
+    # time series
+    "ts_mean": (2, 2, ()),
+    "ts_min": (2, 2, ()),
+    "ts_max": (2, 2, ()),
+    "ts_median": (2, 2, ()),
+    "ts_min_diff": (2, 2, ()),
+    "ts_max_diff": (2, 2, ()),
+    "ts_skewness": (2, 2, ()),
+    "ts_kurtosis": (2, 2, ()),
+    "ts_ir": (2, 2, ()),
+    "ts_returns": (2, 2, ("mode",)),
+    "ts_moment": (2, 2, ("k",)),
+    "ts_entropy": (2, 2, ("buckets",)),
+    "ts_sum": (2, 2, ()),
+    "ts_product": (2, 2, ()),
+    "ts_std_dev": (2, 2, ()),
+    "ts_delta": (2, 2, ()),
+    "ts_delay": (2, 2, ()),
+    "ts_zscore": (2, 2, ()),
+    "ts_arg_max": (2, 2, ()),
+    "ts_arg_min": (2, 2, ()),
+    "ts_av_diff": (2, 2, ()),
+    "ts_count_nans": (2, 2, ()),
+    "ts_rank": (2, 2, ("constant",)),
+    "ts_scale": (2, 2, ("constant",)),
+    "ts_decay_linear": (2, 2, ("dense",)),
+    "ts_decay_exp_window": (2, 2, ("factor",)),
+    "ts_quantile": (2, 2, ("driver",)),
+    "ts_backfill": (2, 2, ("lookback", "k", "ignore")),
+    "ts_corr": (3, 3, ()),
+    "ts_covariance": (3, 3, ()),
+    "ts_regression": (3, 3, ("lag", "rettype")),
+    "ts_partial_corr": (4, 4, ()),
+    "ts_triple_corr": (4, 4, ()),
+    "ts_vector_neut": (3, 3, ()),
+    "ts_vector_proj": (3, 3, ()),
+    "ts_step": (1, 1, ()),
+    "ts_target_tvr_decay": (1, 1, ("lambda_min", "lambda_max", "target_tvr")),
+    "days_from_last_change": (1, 1, ()),
+    "last_diff_value": (2, 2, ()),
+    "kth_element": (2, 2, ("k", "ignore")),
+    "hump": (1, 1, ("hump",)),
+    # cross sectional
+    "rank": (1, 1, ("rate",)),
+    "zscore": (1, 1, ()),
+    "scale": (1, 1, ("scale", "longscale", "shortscale")),
+    "normalize": (1, 1, ("useStd", "limit")),
+    "quantile": (1, 1, ("driver", "sigma")),
+    "winsorize": (1, 1, ("std",)),
+    "bucket": (1, 1, ("range", "buckets")),
+    "tail": (1, 1, ("lower", "upper", "newval")),
+    "left_tail": (1, 1, ("maximum",)),
+    "right_tail": (1, 1, ("minimum",)),
+    "one_side": (1, 1, ("side",)),
+    "truncate": (1, 1, ("maxPercent",)),
+    "regression_neut": (2, 2, ()),
+    "regression_proj": (2, 2, ()),
+    "vector_neut": (2, 2, ()),
+    "vector_proj": (2, 2, ()),
+    # group
+    "group_rank": (2, 2, ()),
+    "group_zscore": (2, 2, ()),
+    "group_scale": (2, 2, ()),
+    "group_neutralize": (2, 2, ()),
+    "group_sum": (2, 2, ()),
+    "group_count": (2, 2, ()),
+    "group_max": (2, 2, ()),
+    "group_min": (2, 2, ()),
+    "group_median": (2, 2, ()),
+    "group_std_dev": (2, 2, ()),
+    "group_normalize": (2, 2, ("constantCheck", "tolerance", "scale")),
+    "group_vector_neut": (3, 3, ()),
+    "group_mean": (3, 3, ()),
+    "group_backfill": (3, 3, ("std",)),
+    # vector
+    "vec_avg": (1, 1, ()),
+    "vec_sum": (1, 1, ()),
+    "vec_max": (1, 1, ()),
+    "vec_min": (1, 1, ()),
+    "vec_count": (1, 1, ()),
+    "vec_stddev": (1, 1, ()),
+    "vec_range": (1, 1, ()),
+    "vec_ir": (1, 1, ()),
+    "vec_norm": (1, 1, ()),
+}
+
+# group fields every region provides, they never show up in the fields table.
+GROUPS = {"market", "sector", "industry", "subindustry", "exchange", "country"}
+
+CONSTANTS = {"nan", "true", "false", "inf"}
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<comment>\#[^\n]*)
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<string>"[^"]*"|'[^']*')
+    |(?P<name>[A-Za-z_][A-Za-z0-9_.]*)
+    |(?P<op>&&|\|\||<=|>=|==|!=|[-+*/^<>!?:(),;=])
+    """,
+    re.VERBOSE,
+)
+
+# binary operator precedence, higher binds tighter. '^' is right associative.
+_BINARY = {
+    "||": 1,
+    "&&": 2,
+    "==": 3,
+    "!=": 3,
+    "<": 4,
+    "<=": 4,
+    ">": 4,
+    ">=": 4,
+    "+": 5,
+    "-": 5,
+    "*": 6,
+    "/": 6,
+    "^": 8,
+}
+_UNARY_PRECEDENCE = 7
+
+
+class ExprError(Exception):
+    def __init__(self, msg: str, pos: int | None = None):
+        self.msg = msg
+        self.pos = pos
+
+    def __str__(self):
+        if self.pos is None:
+            return "invalid expression: {}".format(self.msg)
+        return "invalid expression at {}: {}".format(self.pos, self.msg)
+
+
+class Token:
+    __slots__ = ("kind", "value", "pos")
+
+    def __init__(self, kind: str, value: str, pos: int):
+        self.kind = kind
+        self.value = value
+        self.pos = pos
+
+
+def tokenize(expr: str) -> [Token]:
+    tokens = []
+    pos = 0
+    while pos < len(expr):
+        m = _TOKEN_RE.match(expr, pos)
+        if m is None:
+            raise ExprError("unexpected character {!r}".format(expr[pos]), pos)
+        if m.lastgroup not in ("space", "comment"):
+            tokens.append(Token(m.lastgroup, m.group(), pos))
+        pos = m.end()
+    tokens.append(Token("end", "", pos))
+    return tokens
+
+
+class Node:
+    __slots__ = ("kind", "value", "children", "kwargs", "pos")
+
+    def __init__(self, kind: str, value, pos: int, children=(), kwargs=None):
+        self.kind = kind  # number, string, name, call, unary, binary, ternary, assign
+        self.value = value
+        self.pos = pos
+        self.children = list(children)
+        self.kwargs = kwargs or {}
+
+
+class Parser:
+    def __init__(self, expr: str):
+        self._tokens = tokenize(expr)
+        self._idx = 0
+
+    def _peek(self, offset: int = 0) -> Token:
+        # the end token repeats past the end, truncated input fails on it
+        return self._tokens[min(self._idx + offset, len(self._tokens) - 1)]
+
+    def _next(self) -> Token:
+        tok = self._peek()
+        if tok.kind != "end":
+            self._idx += 1
+        return tok
+
+    def _expect(self, value: str) -> Token:
+        tok = self._next()
+        if tok.value != value or tok.kind not in ("op",):
+            raise ExprError(
+                "expected {!r}, got {!r}".format(value, tok.value or "end"), tok.pos
+            )
+        return tok
+
+    def parse(self) -> [Node]:
+        if self._peek().kind == "end":
+            raise ExprError("empty expression", self._peek().pos)
+
+        statements = []
+        while True:
+            statements.append(self._statement())
+            tok = self._next()
+            if tok.kind == "end":
+                break
+            if tok.value != ";":
+                raise ExprError("unexpected {!r}".format(tok.value), tok.pos)
+            # trailing ';' is allowed
+            if self._peek().kind == "end":
+                break
+        return statements
+
+    def _statement(self) -> Node:
+        tok = self._peek()
+        after = self._peek(1)
+        if tok.kind == "name" and after.kind == "op" and after.value == "=":
+            self._idx += 2
+            return Node("assign", tok.value, tok.pos, [self._expr()])
+        return self._expr()
+
+    def _expr(self) -> Node:
+        cond = self._binary(0)
+        tok = self._peek()
+        if tok.kind == "op" and tok.value == "?":
+            self._next()
+            then = self._expr()
+            self._expect(":")
+            other = self._expr()
+            return Node("ternary", "?", tok.pos, [cond, then, other])
+        return cond
+
+    def _binary(self, min_precedence: int) -> Node:
+        left = self._unary()
+        while True:
+            tok = self._peek()
+            precedence = _BINARY.get(tok.value) if tok.kind == "op" else None
+            if precedence is None or precedence <= min_precedence:
+                return left
+            self._next()
+            # '^' is right associative
+            right = self._binary(precedence - 1 if tok.value == "^" else precedence)
+            left = Node("binary", tok.value, tok.pos, [left, right])
+
+    def _unary(self) -> Node:
+        tok = self._peek()
+        if tok.kind == "op" and tok.value in ("-", "+", "!"):
+            self._next()
+            return Node("unary", tok.value, tok.pos, [self._binary(_UNARY_PRECEDENCE)])
+        return self._primary()
+
+    def _primary(self) -> Node:
+        tok = self._next()
+        if tok.kind == "number":
+            return Node("number", float(tok.value), tok.pos)
+        if tok.kind == "string":
+            return Node("string", tok.value[1:-1], tok.pos)
+        if tok.kind == "name":
+            nxt = self._peek()
+            if nxt.kind == "op" and nxt.value == "(":
+                return self._call(tok)
+            return Node("name", tok.value, tok.pos)
+        if tok.kind == "op" and tok.value == "(":
+            node = self._expr()
+            self._expect(")")
+            return node
+        raise ExprError("unexpected {!r}".format(tok.value or "end"), tok.pos)
+
+    def _call(self, name: Token) -> Node:
+        self._expect("(")
+        node = Node("call", name.value, name.pos)
+        if self._peek().value == ")":
+            self._next()
+            return node
+
+        while True:
+            tok = self._peek()
+            after = self._peek(1)
+            if tok.kind == "name" and after.kind == "op" and after.value == "=":
+                self._idx += 2
+                if tok.value in node.kwargs:
+                    raise ExprError(
+                        "duplicated argument {!r}".format(tok.value), tok.pos
+                    )
+                node.kwargs[tok.value] = self._expr()
+            else:
+                if node.kwargs:
+                    raise ExprError("positional argument after keyword", tok.pos)
+                node.children.append(self._expr())
+
+            tok = self._next()
+            if tok.value == ")":
+                return node
+            if tok.value != ",":
+                raise ExprError(
+                    "expected ',' or ')', got {!r}".format(tok.value or "end"), tok.pos
+                )
+
+
+def parse(expr: str) -> [Node]:
+    return Parser(expr).parse()
+
+
+class Validator:
+    """
+    Check a FASTEXPR expression without sending it to brain.
+
+    `fields` maps field id to field type (MATRIX, VECTOR, GROUP...) for the
+    simulation settings. when it is None, field existence is not checked.
+
+    A rejected expression is never sent, so only certain errors are raised:
+    syntax and unknown fields. Operators or keywords missing in OPERATORS are
+    let through for brain to check.
+    """
+
+    def __init__(self, fields: dict | None = None):
+        self._fields = fields
+
+    def validate(self, expr: str):
+        if not expr or not expr.strip():
+            raise ExprError("empty expression")
+
+        statements = parse(expr)
+        if statements[-1].kind == "assign":
+            raise ExprError("last statement must be an expression", statements[-1].pos)
+
+        variables = set()
+        for stmt in statements:
+            if stmt.kind == "assign":
+                self._check(stmt.children[0], variables)
+                variables.add(stmt.value)
+            else:
+                self._check(stmt, variables)
+
+    def _field_type(self, node: Node, variables: set) -> str | None:
+        if node.kind != "name" or node.value in variables or self._fields is None:
+            return None
+        return self._fields.get(node.value)
+
+    def _check(self, node: Node, variables: set, in_vector_op: bool = False):
+        if node.kind == "name":
+            name = node.value
+            if name in variables or name.lower() in CONSTANTS or name in GROUPS:
+                return
+            if self._fields is None:
+                return
+            if name not in self._fields:
+                raise ExprError("unknown field {!r}".format(name), node.pos)
+            if self._fields[name] == "VECTOR" and not in_vector_op:
+                raise ExprError(
+                    "vector field {!r} must be wrapped by a vec_* operator".format(
+                        name
+                    ),
+                    node.pos,
+                )
+            return
+
+        if node.kind == "call":
+            self._check_call(node, variables)
+            return
+
+        for child in node.children:
+            self._check(child, variables)
+
+    def _check_call(self, node: Node, variables: set):
+        name = node.value
+        min_args, max_args, keywords = OPERATORS.get(name, (0, None, None))
+        if keywords is not None and node.kwargs.keys() <= set(keywords):
+            self._check_signature(node, min_args, max_args)
+
+        is_vector_op = name.startswith("vec_")
+        # an unlisted operator may take vector fields too
+        wraps_vector = is_vector_op or name not in OPERATORS
+        for child in node.children:
+            if is_vector_op and self._field_type(child, variables) not in (
+                None,
+                "VECTOR",
+            ):
+                raise ExprError(
+                    "{} expects a vector field, got {!r}".format(name, child.value),
+                    child.pos,
+                )
+            self._check(child, variables, in_vector_op=wraps_vector)
+
+    def _check_signature(self, node: Node, min_args: int, max_args: int | None):
+        """
+        Arity and keyword checks of a listed operator, only called when every
+        keyword of the call is known.
+        """
+        name = node.value
+        nargs = len(node.children)
+        if nargs + len(node.kwargs) < min_args or (
+            max_args is not None and nargs > max_args
+        ):
+            if max_args is None:
+                expected = "at least {}".format(min_args)
+            elif min_args == max_args:
+                expected = str(min_args)
+            else:
+                expected = "{} to {}".format(min_args, max_args)
+            raise ExprError(
+                "{} takes {} arguments, got {}".format(name, expected, nargs), node.pos
+            )
+
+        for key, value in node.kwargs.items():
+            if value.kind not in ("number", "string", "name", "unary"):
+                raise ExprError(
+                    "argument {!r} of {} must be a constant".format(key, name),
+                    value.pos,
+                )
+
+
+def validate(expr: str, fields: dict | None = None):
+    Validator(fields).validate(expr)
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import select
+import socket
+import stat
+import sys
+import tempfile
+import time
+
+
+def notify_dir(dbfile: str) -> str:
+    """
+    Directory of listener sockets of a DB. It lives in the user's runtime dir,
+    or the temp dir, unix socket paths are limited to about 100 bytes.
+    """
+    key = hashlib.sha1(os.path.abspath(dbfile).encode("utf-8")).hexdigest()[:16]
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, f"wq-notify-{key}")
+    return os.path.join(tempfile.gettempdir(), f"wq-notify-{os.getuid()}-{key}")
+
+
+def _private(directory: str) -> bool:
+    """
+    True if `directory` is ours and closed to other users, who could
+    otherwise plant sockets in it or flood ours.
+    """
+    try:
+        st = os.lstat(directory)
+    except FileNotFoundError:
+        return False
+    return (
+        stat.S_ISDIR(st.st_mode)
+        and st.st_uid == os.getuid()
+        and not st.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+    )
+
+
+def _supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class Notifier:
+    """
+    Wake up every process listening on changes of the same DB file.
+    Without unix sockets it does nothing, listeners fall back to polling.
+    """
+
+    def __init__(self, dbfile: str):
+        self._dir = notify_dir(dbfile) if _supported() else None
+
+    def notify(self):
+        if self._dir is None or not _private(self._dir):
+            return
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for name in os.listdir(self._dir):
+                path = os.path.join(self._dir, name)
+                try:
+                    sock.sendto(b"!", path)
+                except BlockingIOError:
+                    pass  # listener has unread wakeups, it is awake anyway
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # listener exited without cleaning up
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                except OSError:
+                    pass
+
+
+class Listener:
+    """
+    Block until a Notifier of the same DB file fires, or timeout.
+    """
+
+    def __init__(self, dbfile: str):
+        self._sock = None
+        self._path = None
+        if not _supported():
+            return
+
+        directory = notify_dir(dbfile)
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+        if not _private(directory):
+            print(
+                f"{directory} is not private to this user, polling instead.",
+                file=sys.stderr,
+            )
+            return
+
+        self._path = os.path.join(directory, f"{os.getpid()}.sock")
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self._path)
+        self._sock.setblocking(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Return True if woken up by a notification, False on timeout.
+        """
+        if self._sock is None:
+            time.sleep(timeout)
+            return False
+
+        readable, _, _ = select.select([self._sock], [], [], timeout)
+        if not readable:
+            return False
+
+        # collapse pending wakeups into one
+        try:
+            while self._sock.recv(16):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def wake(self):
+        """
+        Wake up own wait, safe to call from a signal handler.
+        """
+        if self._sock is None:
+            return
+
+        try:
+            self._sock.sendto(b"!", self._path)
+        except OSError:
+            pass
+
+    def close(self):
+        if self._sock is None:
+            return
+
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self._path)
+        except FileNotFoundError:
+            pass
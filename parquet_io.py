@@ -0,0 +1,309 @@
+import argparse
+import os
+import sys
+
+from alpha_db import AlphaDB
+
+# numeric metrics flattened from is_summary, train and test
+METRICS = (
+    "pnl",
+    "bookSize",
+    "longCount",
+    "shortCount",
+    "turnover",
+    "returns",
+    "drawdown",
+    "margin",
+    "sharpe",
+    "fitness",
+)
+
+# simulation settings flattened from settings json
+SETTINGS = (
+    ("instrumentType", "string"),
+    ("region", "string"),
+    ("universe", "string"),
+    ("delay", "int64"),
+    ("decay", "int64"),
+    ("neutralization", "string"),
+    ("truncation", "float64"),
+    ("pasteurization", "string"),
+    ("unitHandling", "string"),
+    ("nanHandling", "string"),
+    ("language", "string"),
+)
+
+FIELDS_COLUMNS = (
+    ("id", "string"),
+    ("type", "string"),
+    ("dataset_id", "string"),
+    ("category_id", "string"),
+    ("subcategroy_id", "string"),
+    ("universe", "string"),
+    ("region", "string"),
+    ("delay", "int64"),
+    ("description", "string"),
+)
+
+SIMULATIONS_COLUMNS = (
+    ("id", "int64"),
+    ("expr", "string"),
+    ("type", "string"),
+    ("settings", "string"),
+    ("status", "string"),
+    ("created_at", "int64"),
+    ("simulated_at", "int64"),
+    ("simulation_id", "string"),
+    ("completed_at", "int64"),
+    ("alpha_id", "string"),
+    ("reason", "string"),
+    ("account", "string"),
+)
+
+ALPHAS_COLUMNS = (
+    ("id", "string"),
+    ("settings", "string"),
+    ("status", "string"),
+    ("grade", "string"),
+    ("stage", "string"),
+    ("is_summary", "string"),
+    ("train", "string"),
+    ("test", "string"),
+    ("checks", "string"),
+)
+
+
+# sqlite type of numeric arrow columns, json values like `"delay": "1"` are
+# cast by sqlite instead of failing the arrow conversion.
+_CASTS = {"int64": "INTEGER", "float64": "REAL"}
+
+
+def _cast(expr: str, type: str) -> str:
+    return f"CAST({expr} AS {_CASTS[type]})" if type in _CASTS else expr
+
+
+def _flatten(source: str, keys, prefix: str) -> [tuple]:
+    """
+    Columns extracted from a json column by sqlite, no json decoding in python.
+    """
+    return [
+        (f"json_extract({source}, '$.{key}')", f"{prefix}_{key}", type)
+        for key, type in keys
+    ]
+
+
+def _table_spec(table: str, archived: bool) -> (str, [tuple]):
+    """
+    Return select sql and (name, arrow type) of every exported column.
+    """
+    if table == "fields":
+        columns = [(name, name, type) for name, type in FIELDS_COLUMNS]
+        source = "fields"
+    elif table == "simulations":
+        columns = [(name, name, type) for name, type in SIMULATIONS_COLUMNS]
+        columns += _flatten("settings", SETTINGS, "settings")
+        source = "all_simulations" if archived else "simulations"
+    elif table == "alphas":
+        columns = [(name, name, type) for name, type in ALPHAS_COLUMNS]
+        columns += _flatten("settings", SETTINGS, "settings")
+        metrics = [(x, "float64") for x in METRICS]
+        for column, prefix in (
+            ("is_summary", "is"),
+            ("train", "train"),
+            ("test", "test"),
+        ):
+            columns += _flatten(column, metrics, prefix)
+        source = "all_alphas" if archived else "alphas"
+    else:
+        raise ValueError(f"unknown table: {table}")
+
+    sql = "SELECT {} FROM {}".format(
+        ", ".join(f"{_cast(expr, type)} AS {name}" for expr, name, type in columns),
+        source,
+    )
+    return sql, [(name, type) for _, name, type in columns]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        print(
+            "pyarrow is required, install with `pip install worldquant[parquet]`.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    return pyarrow
+
+
+def export_table(db: AlphaDB, table: str, path: str, batch_size: int = 50000) -> int:
+    """
+    Stream a table to parquet file, at most `batch_size` rows in memory.
+    The file is written aside and only replaces `path` once complete.
+    """
+    pa = _pyarrow()
+
+    sql, columns = _table_spec(table, db.archived)
+    schema = pa.schema([(name, getattr(pa, type)()) for name, type in columns])
+
+    cursor = db.conn.cursor()
+    cursor.execute(sql)
+
+    count = 0
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.parquet.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                arrays = [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*rows), schema)
+                ]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                count += len(rows)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return count
+
+
+INSERT_FIELDS = "INSERT OR IGNORE INTO fields VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+INSERT_ALPHAS = "INSERT OR IGNORE INTO alphas(id, settings, status, grade, stage, is_summary, train, test, checks) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+# archived alphas are kept in the archive, not copied back to hot alphas
+INSERT_ALPHAS_ARCHIVED = """INSERT OR IGNORE INTO alphas(id, settings, status, grade, stage, is_summary, train, test, checks)
+    SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9
+    WHERE NOT EXISTS (SELECT 1 FROM archive.alphas WHERE id = ?1)"""
+
+# ids of simulations from other DBs clash, they are given new ones. a
+# simulation already known by its brain simulation id is skipped, one never
+# sent (PENDING, invalid...) is skipped when the same simulation is known,
+# otherwise importing twice or overlapping DBs would send it again.
+INSERT_SIMULATIONS = """INSERT INTO simulations(expr, type, settings, status, created_at,
+        simulated_at, simulation_id, completed_at, alpha_id, reason, account)
+    SELECT :expr, :type, :settings, :status, :created_at, :simulated_at,
+        :simulation_id, :completed_at, :alpha_id, :reason, :account
+    WHERE {}"""
+
+UNKNOWN_SIMULATION = """CASE WHEN :simulation_id IS NULL
+        THEN NOT EXISTS (SELECT 1 FROM {table}
+            WHERE expr = :expr AND type = :type AND settings = :settings)
+        ELSE NOT EXISTS (SELECT 1 FROM {table} WHERE simulation_id = :simulation_id)
+    END"""
+
+# archived simulations are compressed, their keys are decompressed once into
+# a temp table for the duration of an import.
+CREATE_ARCHIVED_KEYS = """CREATE TEMP TABLE archived_simulations AS
+    SELECT simulation_id, decompress(expr) AS expr, type, decompress(settings) AS settings
+    FROM archive.simulations"""
+
+
+def _insert_simulations_sql(archived: bool) -> str:
+    tables = ["main.simulations"]
+    if archived:
+        tables.append("temp.archived_simulations")
+    return INSERT_SIMULATIONS.format(
+        " AND ".join(UNKNOWN_SIMULATION.format(table=table) for table in tables)
+    )
+
+
+def import_table(db: AlphaDB, table: str, path: str, batch_size: int = 50000) -> int:
+    """
+    Merge rows of a parquet file exported by `export_table` into the DB.
+    Existing fields and alphas are kept, known simulations are skipped,
+    archived ones included.
+    """
+    pa = _pyarrow()
+    archived = db.archived
+
+    if table == "fields":
+        names = [name for name, _ in FIELDS_COLUMNS]
+        sql = INSERT_FIELDS
+    elif table == "simulations":
+        names = [name for name, _ in SIMULATIONS_COLUMNS if name != "id"]
+        sql = _insert_simulations_sql(archived)
+    elif table == "alphas":
+        names = [name for name, _ in ALPHAS_COLUMNS]
+        sql = INSERT_ALPHAS_ARCHIVED if archived else INSERT_ALPHAS
+    else:
+        raise ValueError(f"unknown table: {table}")
+
+    file = pa.parquet.ParquetFile(path)
+    cursor = db.conn.cursor()
+    if table == "simulations" and archived:
+        cursor.execute(CREATE_ARCHIVED_KEYS)
+        cursor.execute(
+            "CREATE INDEX temp.archived_simulations_id ON archived_simulations(simulation_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX temp.archived_simulations_expr ON archived_simulations(expr)"
+        )
+
+    count = 0
+    try:
+        for batch in file.iter_batches(batch_size=batch_size, columns=names):
+            values = [batch.column(name).to_pylist() for name in names]
+            if table == "simulations":
+                rows = (dict(zip(names, row)) for row in zip(*values))
+            else:
+                rows = zip(*values)
+
+            cursor.executemany(sql, rows)
+            db.conn.commit()
+            count += cursor.rowcount
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS temp.archived_simulations")
+
+    return count
+
+
+TABLES = ("fields", "simulations", "alphas")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export AlphaDB tables to parquet files, or import them back."
+    )
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("--db", default="alpha.db", help="sqlite db of alphas.")
+    parser.add_argument(
+        "--dir", default=".", help="directory of `<table>.parquet` files."
+    )
+    parser.add_argument(
+        "--tables",
+        nargs="+",
+        choices=TABLES,
+        default=TABLES,
+        help="tables to export or import.",
+    )
+    parser.add_argument(
+        "--batch_size", default=50000, type=int, help="rows kept in memory at once."
+    )
+
+    args = parser.parse_args(sys.argv[1:])
+
+    with AlphaDB(args.db) as db:
+        for table in args.tables:
+            path = os.path.join(args.dir, f"{table}.parquet")
+            if args.command == "export":
+                count = export_table(db, table, path, args.batch_size)
+                print(f"{count} {table} exported to {path}.")
+            elif not os.path.exists(path):
+                print(f"{path} not found, skip {table}.", file=sys.stderr)
+            else:
+                count = import_table(db, table, path, args.batch_size)
+                print(f"{count} {table} imported from {path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+
+# what to do with a failed attempt
+RETRY = "RETRY"  # transient, try again after backoff
+FAIL = "FAIL"  # request error that retrying will not fix
+RAISE = "RAISE"  # not a request error (programmer error), propagate as it is
+
+
+def default_retry_exceptions() -> tuple:
+    import requests
+
+    return (
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    )
+
+
+def connect_failed(err: Exception) -> bool:
+    """
+    True if the request surely never reached the server. requests raises
+    ConnectionError both when connecting fails (wrapping urllib3
+    MaxRetryError) and when the connection breaks after the request was
+    written (wrapping ProtocolError or OSError).
+    """
+    import requests
+    import urllib3
+
+    if isinstance(err, requests.ConnectTimeout):
+        return True
+    return (
+        isinstance(err, requests.ConnectionError)
+        and bool(err.args)
+        and isinstance(err.args[0], urllib3.exceptions.MaxRetryError)
+    )
+
+
+def default_fail_exceptions() -> tuple:
+    import requests
+
+    return (requests.RequestException,)
+
+
+class RetryPolicy:
+    """
+    Classify failed attempts and compute backoff between them.
+
+    Responses with a status in `retry_statuses` and exceptions in
+    `retry_exceptions` are retried up to `max_attempts` attempts in total,
+    waiting exponential backoff with full jitter (or Retry-After when the
+    server gives one). 401 triggers re-authentication, counted separately
+    up to `max_reauth` times.
+
+    Methods not in `idempotent_methods` (POST creating a simulation...) may
+    have been applied by the server even though the attempt failed, a retry
+    would do it twice. They are retried only on `unsafe_retry_statuses` and
+    connection failures (`connect_failed`), when it was never processed.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        jitter: bool = True,
+        retry_statuses: tuple = (500, 502, 503, 504),
+        retry_exceptions: tuple | None = None,
+        idempotent_methods: tuple = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE"),
+        unsafe_retry_statuses: tuple = (503,),
+        fail_exceptions: tuple | None = None,
+        max_reauth: int = 1,
+        timeout: float | tuple | None = (10.0, 60.0),
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self._retry_exceptions = retry_exceptions
+        self.idempotent_methods = frozenset(idempotent_methods)
+        self.unsafe_retry_statuses = frozenset(unsafe_retry_statuses)
+        self._fail_exceptions = fail_exceptions
+        self.max_reauth = max_reauth
+        self.timeout = timeout
+
+    @property
+    def retry_exceptions(self) -> tuple:
+        if self._retry_exceptions is None:
+            self._retry_exceptions = default_retry_exceptions()
+        return self._retry_exceptions
+
+    @property
+    def fail_exceptions(self) -> tuple:
+        if self._fail_exceptions is None:
+            self._fail_exceptions = default_fail_exceptions()
+        return self._fail_exceptions
+
+    def idempotent(self, method: str) -> bool:
+        return method.upper() in self.idempotent_methods
+
+    def classify_status(self, status_code: int, method: str = "GET") -> str | None:
+        """
+        RETRY for transient server errors, None when the response is final.
+        """
+        if self.idempotent(method):
+            statuses = self.retry_statuses
+        else:
+            statuses = self.unsafe_retry_statuses
+        return RETRY if status_code in statuses else None
+
+    def classify_exception(self, err: Exception, method: str = "GET") -> str:
+        if self.idempotent(method):
+            if isinstance(err, self.retry_exceptions):
+                return RETRY
+        elif connect_failed(err):
+            return RETRY
+
+        if isinstance(err, self.fail_exceptions):
+            return FAIL
+        return RAISE
+
+    def maybe_applied(self, err: Exception, method: str) -> bool:
+        """
+        True if a failed non idempotent request may still have been processed
+        by the server: the error would be retried for an idempotent one, but
+        the request did reach the server.
+        """
+        return (
+            not self.idempotent(method)
+            and isinstance(err, self.retry_exceptions)
+            and not connect_failed(err)
+        )
+
+    def can_retry(self, attempt: int) -> bool:
+        """
+        `attempt` is the number of attempts already made.
+        """
+        return attempt < self.max_attempts
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        ceiling = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return random.uniform(0, ceiling) if self.jitter else ceiling
+
+
+class RetryBudget:
+    """
+    Limit retries to a fraction of requests, so an outage does not multiply
+    the load. Every request earns `ratio` token, every retry spends one.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+class CircuitBreaker:
+    """
+    Opened after `failure_threshold` consecutive failures, then every caller
+    sharing it waits `reset_timeout` seconds before one probe request is let
+    through. The probe success closes it, its failure opens it again.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._cond = threading.Condition()
+
+    def wait(self):
+        """
+        Block while the circuit is open.
+        """
+        with self._cond:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+
+                if self.state == self.OPEN:
+                    remain = self.opened_at + self.reset_timeout - time.monotonic()
+                    if remain <= 0:
+                        # this caller is the probe
+                        self.state = self.HALF_OPEN
+                        return
+                    self._cond.wait(remain)
+                else:
+                    # a probe is in flight, go on if it never reports back
+                    if not self._cond.wait(self.reset_timeout):
+                        return
+
+    def record_success(self):
+        with self._cond:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                self._cond.notify_all()
+
+    def record_failure(self):
+        with self._cond:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._cond.notify_all()
@@ -4,6 +4,7 @@ import sys
 import time
 
 import brain
+import fastexpr
 
 from alpha_db import AlphaDB
 
@@ -22,60 +23,110 @@ def print_erro(idx: int, expr: str, msg: str):
     print(f"[{idx:0>3}][\33[0;31mERRO\033[0m] {expr:<50} {msg}")
 
 
-class RateLimiter:
-    def __init__(self):
-        self.wait_secs = 1.0
-        self.succ_streak = 0
-        self.fail_streak = 0
-
-    def succ(self):
-        if self.fail_streak:
-            self.wait_secs /= 2.0
-            self.fail_streak = 0
-        else:
-            self.succ_streak += 1
-
-        if self.succ_streak >= 5:
-            factor = 0.02 * float(self.succ_streak) if self.succ_streak < 10 else 0.14
-            self.wait_secs = self.wait_secs * (0.8 + factor)
-
-        return self.wait_secs
-
-    def fail(self):
-        self.succ_streak = 0
-        self.fail_streak += 1
-        self.wait_secs *= 2.1
-
-        return self.wait_secs
-
-    def wait(self):
-        time.sleep(self.wait_secs)
-
-
-def simulate(db: AlphaDB, sim: brain.Simulation, limit: int):
-    guard = RateLimiter()
+def simulate(db: AlphaDB, pool: brain.ClientPool, limit: int, stale_secs: float):
     simulations = db.simulations()
+    fields = db.fields()
+    known_fields = {}
+    sent = 0  # simulations started, rows rejected do not count
+
     for idx, row in enumerate(simulations.filter(status="PENDING"), start=1):
-        while True:
+        settings = brain.Simulation(None).with_settings(**row.settings).settings
+        key = (settings["region"], settings["universe"], int(settings["delay"]))
+        if key not in known_fields:
+            # None when fields are not fully crawled, brain checks them then
+            known_fields[key] = fields.known_types(*key)
+
+        try:
+            if settings["language"] == "FASTEXPR":
+                fastexpr.validate(row.expr, known_fields[key])
+        except fastexpr.ExprError as e:
+            simulations.error(row.id, str(e))
+            print_erro(idx, row.expr, str(e))
+            invalid = True
+        else:
+            invalid = False
+
+        waiting = False
+        while not invalid:
+            running = simulations.in_flight(stale_secs)
+            cli = pool.acquire(running)
+            if cli is None:
+                secs = pool.wait_secs(running)
+                # slots are only freed by collect.py, blame it only when they
+                # are all taken, not while accounts pause after errors
+                if not waiting and pool.full(running):
+                    counts = pool.in_flight(running)
+                    usage = ", ".join(
+                        f"{user} {counts[user]}/{pool.controller(user).capacity}"
+                        for user in pool.users
+                    )
+                    print_erro(
+                        idx,
+                        row.expr,
+                        f"all slots taken ({usage} running), is collect.py running?",
+                    )
+                    waiting = True
+                time.sleep(secs)
+                continue
+
+            ctl = pool.controller(cli.user)
             try:
                 result = (
-                    sim.with_type(row["type"])
-                    .with_settings(**row["settings"])
-                    .with_expr(row["expr"])
+                    cli.simulation()
+                    .with_type(row.type)
+                    .with_settings(**row.settings)
+                    .with_expr(row.expr)
                     .send()
                 )
 
-                simulations.start(row["id"], result.simulation_id)
+                simulations.start(row.id, result.simulation_id, cli.user)
+                # brain answers slower when the account runs more than it can
+                ctl.on_success(result.latency)
 
-                print_succ(idx, row["expr"], f"Next after {guard.succ():.2f} secs.")
-                guard.wait()
+                print_succ(idx, row.expr, f"{cli.user} slots {ctl.limit:.2f}.")
 
+                sent += 1
                 break
-            except brain.BrainError:
-                print_erro(idx, row["expr"], f"Retry after {guard.fail():.2f} secs.")
-                guard.wait()
+            except brain.SimulationAPIError as e:
+                if e.concurrency_limited:
+                    ctl.on_limit(pool.in_flight(running)[cli.user])
+                    msg = f"{cli.user} limit {ctl.server_limit} simulations."
+                elif e.throttled:
+                    ctl.on_throttle(e.retry_after)
+                    msg = (
+                        f"{cli.user} throttled, retry after {ctl.wait_secs():.2f} secs."
+                    )
+                elif e.retryable:
+                    ctl.on_error(e)
+                    msg = f"{cli.user} retry after {ctl.wait_secs():.2f} secs."
+                else:
+                    simulations.error(row.id, e.reason)
+                    print_erro(idx, row.expr, e.reason)
+                    break
+
+                print_erro(idx, row.expr, msg)
+            except brain.OutcomeUnknownError as e:
+                # it may be running already, sending it again could run it
+                # twice: leave it for the user to check and requeue
+                ctl.on_error(e)
+                simulations.error(row.id, str(e))
+                print_erro(idx, row.expr, str(e))
+                break
+            except brain.AuthenticationError as e:
+                # other accounts go on without it
+                pool.disable(cli.user)
+                print_erro(idx, row.expr, f"{cli.user} disabled: {e}")
+                if not pool.users:
+                    raise
+            except brain.BrainError as e:
+                ctl.on_error(e)
+                print_erro(
+                    idx,
+                    row.expr,
+                    f"{cli.user} retry after {ctl.wait_secs():.2f} secs.",
+                )
 
-        if limit != 0 and idx >= limit:
+        if limit != 0 and sent >= limit:
             break
 
 
@@ -91,24 +142,40 @@ def main():
         default=os.environ.get("WQB_PASS"),
         help="Brain API password. use env WQB_PASS if not given.",
     )
+    parser.add_argument(
+        "--accounts",
+        default=os.environ.get("WQB_ACCOUNTS"),
+        help="file of Brain API accounts, one `user password [max_simulations]` each line. "
+        "use env WQB_ACCOUNTS if not given, --user and --password are ignored if set.",
+    )
     parser.add_argument(
         "--db", default="alpha.db", help="sqlite db that store all simulations."
     )
     parser.add_argument(
         "--limit", default=0, type=int, help="max number of alpha to send."
     )
+    parser.add_argument(
+        "--stale_secs",
+        default=1800.0,
+        type=float,
+        help="simulations started longer ago no longer take a slot, "
+        "in case they are never collected.",
+    )
 
     args = parser.parse_args(sys.argv[1:])
 
-    if not args.user or not args.password:
+    if args.accounts:
+        accounts = brain.load_accounts(args.accounts)
+    elif args.user and args.password:
+        accounts = [(args.user, args.password)]
+    else:
         print("no user or password found.", file=sys.stderr)
         sys.exit(1)
 
-    cli = brain.Client(args.user, args.password)
-    sim = cli.simulation()
+    pool = brain.ClientPool(accounts)
 
     with AlphaDB(args.db) as db:
-        simulate(db, sim, args.limit)
+        simulate(db, pool, args.limit, args.stale_secs)
 
 
 if __name__ == "__main__":
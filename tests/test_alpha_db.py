@@ -0,0 +1,63 @@
+import pytest
+
+from alpha_db import AlphaDB
+from fastexpr import ExprError, validate
+
+
+def brain_field(id: str, type: str = "MATRIX", dataset: str = "fundamental6") -> dict:
+    return {
+        "id": id,
+        "type": type,
+        "dataset": {"id": dataset},
+        "category": {"id": "fundamental"},
+        "subcategory": {"id": "fundamental-data"},
+        "universe": "TOP3000",
+        "region": "USA",
+        "delay": 1,
+        "description": id,
+    }
+
+
+@pytest.fixture
+def db(tmp_path):
+    with AlphaDB(str(tmp_path / "alpha.db")) as db:
+        yield db
+
+
+def test_partial_crawl_does_not_reject_fields(db):
+    # like `crawl.py --dataset_id fundamental6`: close is not crawled
+    fields = db.fields()
+    fields.insert_many([brain_field("assets"), brain_field("liabilities")])
+
+    known = fields.known_types("USA", "TOP3000", 1)
+    assert known is None
+    validate("rank(close / assets)", known)
+
+
+def test_full_crawl_rejects_unknown_fields(db):
+    fields = db.fields()
+    fields.insert_many([brain_field("assets"), brain_field("close", dataset="pv1")])
+    fields.crawled("USA", "TOP3000", 1)
+
+    known = fields.known_types("USA", "TOP3000", 1)
+    assert known == {"assets": "MATRIX", "close": "MATRIX"}
+    validate("rank(close / assets)", known)
+    with pytest.raises(ExprError, match="unknown field 'open'"):
+        validate("rank(open)", known)
+
+    # other settings are not covered by the crawl
+    assert fields.known_types("USA", "TOP500", 1) is None
+
+
+@pytest.mark.parametrize(
+    "content", ['{"id": "a1", "is": {"checks": []}}', b'{"id": "a1"}']
+)
+def test_save_raw(db, content):
+    assert db.alphas().save_raw(content) == "a1"
+
+
+@pytest.mark.parametrize("content", ['{"status": "ACTIVE"}', "[]", "<html>", ""])
+def test_save_raw_not_an_alpha(db, content):
+    alphas = db.alphas()
+    assert alphas.save_raw(content) is None
+    assert alphas.save_raw('{"id": "a1"}') == "a1"
@@ -0,0 +1,38 @@
+import brain
+
+
+def pool() -> brain.ClientPool:
+    return brain.ClientPool([("a", "pa"), ("b", "pb", 2)], session_dir=None)
+
+
+def test_client_of_account():
+    p = pool()
+    assert p.client("b").user == "b"
+    # simulations started before accounts were recorded
+    assert p.client(None).user == "a"
+    # another account's simulations can not be read with ours
+    assert p.client("other") is None
+
+
+def test_unknown_accounts_take_no_slot():
+    p = pool()
+    assert p.in_flight({None: 1, "b": 2, "other": 5}) == {"a": 1, "b": 2}
+
+
+def test_disable():
+    p = pool()
+    p.disable("a")
+    assert p.users == ["b"]
+    assert p.client("a") is None
+    assert p.client(None) is None
+    assert p.acquire({}).user == "b"
+
+
+def test_full():
+    p = pool()
+    assert not p.full({"a": 0, "b": 1})
+    assert p.full({"a": 1, "b": 1})  # slots start at one each
+
+    p.disable("a")
+    assert p.full({"b": 1})
+    assert p.acquire({"b": 1}) is None
@@ -0,0 +1,158 @@
+import pytest
+
+from concurrency import ConcurrencyController
+
+
+def test_slow_start_grows_by_one():
+    ctl = ConcurrencyController()
+    for _ in range(4):
+        ctl.on_success()
+    assert ctl.limit == 5.0
+    assert ctl.capacity == 5
+    assert ctl.slow_start
+
+
+def test_additive_increase_after_congestion():
+    ctl = ConcurrencyController(initial=8)
+    ctl.on_throttle(retry_after=0)
+    assert ctl.limit == 4.0
+    assert not ctl.slow_start
+
+    ctl.on_success()
+    assert ctl.limit == pytest.approx(4.25)
+
+    # about one slot per `limit` successes
+    for _ in range(3):
+        ctl.on_success()
+    assert ctl.capacity == 4
+    ctl.on_success()
+    assert ctl.capacity == 5
+
+
+def test_maximum():
+    ctl = ConcurrencyController(maximum=3)
+    for _ in range(10):
+        ctl.on_success()
+    assert ctl.limit == 3.0
+
+
+def test_limit_holds_at_server_limit():
+    ctl = ConcurrencyController(initial=10, probe_after=5)
+    ctl.on_limit(7)
+    assert ctl.limit == 7.0
+    assert ctl.server_limit == 7
+    assert ctl.has_capacity(6)
+    assert not ctl.has_capacity(7)
+
+    # no pause, a concurrency limit is not throttling
+    assert ctl.wait_secs() == 0.0
+
+    for _ in range(4):
+        ctl.on_success()
+    assert ctl.limit == 7.0
+
+    # probes one above the known limit after `probe_after` successes at it
+    for _ in range(10):
+        ctl.on_success()
+    assert 7.0 < ctl.limit <= 8.0
+
+    # server still refuses the probe
+    ctl.on_limit(8)
+    assert ctl.server_limit == 8
+
+
+def test_successful_probe_resumes_growth():
+    ctl = ConcurrencyController(probe_after=10)
+    ctl.on_limit(1)
+    for _ in range(20):
+        ctl.on_success()
+    assert ctl.server_limit is None
+    assert "probe" in [d.event for d in ctl.decisions]
+
+    for _ in range(10_000):
+        ctl.on_success()
+    assert ctl.server_limit is None
+    assert ctl.limit > 10.0
+
+    ctl.on_limit(12)
+    assert ctl.limit == 12.0
+
+
+def test_limit_below_minimum():
+    ctl = ConcurrencyController(initial=4)
+    ctl.on_limit(0)
+    assert ctl.server_limit == 1
+    assert ctl.capacity == 1
+
+
+def test_throttle_halves_and_pauses():
+    ctl = ConcurrencyController(initial=8)
+    ctl.on_throttle(retry_after=30)
+    assert ctl.limit == 4.0
+    assert ctl.wait_secs() == pytest.approx(30, abs=1)
+    assert not ctl.has_capacity(0)
+
+    ctl.on_throttle(retry_after=1)
+    assert ctl.limit == 2.0
+    # a shorter Retry-After does not cut the pause
+    assert ctl.wait_secs() > 20
+
+
+def test_throttle_cooldown_without_retry_after():
+    ctl = ConcurrencyController(initial=16, cooldown=1.0)
+    ctl.on_throttle()
+    ctl.paused_until = 0.0
+    ctl.on_throttle()
+    assert ctl.wait_secs() == pytest.approx(2.0, abs=0.1)
+    assert ctl.throttle_streak == 2
+
+    ctl.on_success()
+    assert ctl.throttle_streak == 0
+
+
+def test_error_pauses_without_changing_limit():
+    ctl = ConcurrencyController(initial=4)
+    ctl.on_error(ValueError("network"))
+    assert ctl.limit == 4.0
+    assert ctl.slow_start
+    assert ctl.wait_secs() > 0
+    assert ctl.decisions[-1].event == "error"
+
+
+def test_latency_stops_growth_and_shrinks():
+    ctl = ConcurrencyController(initial=10, latency_tolerance=2.0)
+    for _ in range(5):
+        ctl.on_success(1.0)
+    assert ctl.limit == 15.0
+
+    for _ in range(5):
+        ctl.on_success(10.0)
+    assert ctl.limit < 15.0
+    assert not ctl.slow_start
+    assert ctl.decisions[-1].event == "latency"
+
+    # recovers once latency is back to normal
+    for _ in range(20):
+        ctl.on_success(1.0)
+    assert ctl.decisions[-1].event == "increase"
+
+
+def test_latency_outlier_expires():
+    ctl = ConcurrencyController(initial=4, latency_window=5)
+    ctl.on_success(0.01)
+    for _ in range(20):
+        ctl.on_success(1.0)
+    assert ctl.min_latency == 1.0
+    assert ctl.decisions[-1].event == "increase"
+
+
+def test_decisions_and_state():
+    ctl = ConcurrencyController()
+    ctl.on_success()
+    ctl.on_limit(1)
+    ctl.on_success()  # no change, not recorded
+
+    assert [d.event for d in ctl.decisions] == ["increase", "limit"]
+    state = ctl.state()
+    assert state["limit"] == 1.0
+    assert state["server_limit"] == 1
@@ -0,0 +1,81 @@
+import pytest
+
+from fastexpr import ExprError, validate
+
+FIELDS = {"close": "MATRIX", "volume": "MATRIX", "news": "VECTOR"}
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "rank(",
+        "rank(close,",
+        "rank(close, rate=",
+        "ts_mean(close",
+        "close +",
+        "x = ",
+        "(close",
+        "close ? 1",
+    ],
+)
+def test_truncated_input(expr):
+    with pytest.raises(ExprError):
+        validate(expr, FIELDS)
+
+
+@pytest.mark.parametrize("expr", ["", "  ", "# x", "# x\n  # y\n"])
+def test_empty_input(expr):
+    with pytest.raises(ExprError, match="empty expression"):
+        validate(expr, FIELDS)
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "rank(close)",
+        "x = ts_mean(close, 5); rank(x)  # comment",
+        "ts_backfill(close, lookback=5)",
+        "ts_backfill(close, 5, k=1)",
+        "vector_neut(close, volume)",
+        "group_sum(close, sector)",
+        "floor(close)",
+        "ts_ir(close, 20)",
+        "vec_avg(news) * -1",
+        "close > 0 ? close : volume",
+    ],
+)
+def test_valid(expr):
+    validate(expr, FIELDS)
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "some_new_operator(close, 1, 2)",
+        "ts_mean(close, d=5)",
+        "ts_rank(close, 5, unknown=1)",
+        "new_vector_op(news)",
+    ],
+)
+def test_unlisted_is_left_to_brain(expr):
+    validate(expr, FIELDS)
+
+
+@pytest.mark.parametrize(
+    "expr, msg",
+    [
+        ("rank(open)", "unknown field 'open'"),
+        ("some_new_operator(open)", "unknown field 'open'"),
+        ("rank(close, volume)", "rank takes 1 arguments, got 2"),
+        ("ts_mean(close)", "ts_mean takes 2 arguments, got 1"),
+        ("rank(news)", "must be wrapped by a vec_\\* operator"),
+        ("close + )", "unexpected"),
+    ],
+)
+def test_invalid(expr, msg):
+    with pytest.raises(ExprError, match=msg):
+        validate(expr, FIELDS)
+
+
+def test_fields_unknown():
+    validate("rank(open)", None)
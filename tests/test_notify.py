@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from notify import Listener, Notifier, notify_dir
+
+
+@pytest.fixture(autouse=True)
+def runtime_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+
+def test_notify_wakes_listener():
+    with Listener("alpha.db") as listener:
+        assert os.stat(notify_dir("alpha.db")).st_mode & 0o777 == 0o700
+        Notifier("alpha.db").notify()
+        assert listener.wait(1)
+
+
+def test_shared_dir_is_not_used():
+    directory = notify_dir("alpha.db")
+    os.mkdir(directory, 0o777)
+    os.chmod(directory, 0o777)
+
+    with Listener("alpha.db") as listener:
+        assert listener._sock is None
+    assert os.listdir(directory) == []
@@ -0,0 +1,167 @@
+import pytest
+import requests
+import urllib3
+
+import brain
+
+from retry import FAIL, RAISE, RETRY, CircuitBreaker, RetryPolicy
+
+
+class FakeSession:
+    """
+    Session answering with the given responses or exceptions in order.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.sent = []
+
+    def prepare_request(self, req):
+        return req
+
+    def send(self, req, timeout=None):
+        self.sent.append(req.method)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def response(status: int) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    return resp
+
+
+def connect_error() -> requests.ConnectionError:
+    return requests.ConnectionError(
+        urllib3.exceptions.MaxRetryError(None, "/", "connection refused")
+    )
+
+
+def client(session: FakeSession, **kwargs) -> brain.Client:
+    kwargs.setdefault("retry_policy", RetryPolicy(base_delay=0, max_delay=0))
+    cli = brain.Client("user", "pass", session_dir=None, **kwargs)
+    cli._session = session
+    return cli
+
+
+def test_classify_idempotent():
+    policy = RetryPolicy()
+    assert policy.classify_exception(requests.ReadTimeout()) == RETRY
+    assert policy.classify_exception(connect_error()) == RETRY
+    assert policy.classify_exception(requests.exceptions.InvalidURL()) == FAIL
+    assert policy.classify_exception(ValueError()) == RAISE
+    assert policy.classify_status(502) == RETRY
+    assert policy.classify_status(404) is None
+
+
+def test_classify_post():
+    policy = RetryPolicy()
+    assert policy.classify_exception(requests.ReadTimeout(), "POST") == FAIL
+    assert policy.classify_exception(requests.ConnectTimeout(), "POST") == RETRY
+    assert policy.classify_exception(connect_error(), "POST") == RETRY
+
+    # connection broke after the request was written
+    aborted = requests.ConnectionError(
+        urllib3.exceptions.ProtocolError("Connection aborted.")
+    )
+    assert policy.classify_exception(aborted, "POST") == FAIL
+    assert (
+        policy.classify_exception(requests.exceptions.ChunkedEncodingError(), "POST")
+        == FAIL
+    )
+
+    assert policy.classify_status(503, "POST") == RETRY
+    assert policy.classify_status(500, "POST") is None
+    assert policy.classify_status(504, "POST") is None
+
+
+def test_post_not_resent_after_read_timeout():
+    session = FakeSession(requests.ReadTimeout(), response(201))
+    cli = client(session)
+
+    with pytest.raises(brain.OutcomeUnknownError):
+        cli._send(requests.Request("POST", "http://brain/simulations"))
+    assert session.sent == ["POST"]
+
+
+@pytest.mark.parametrize("outcome", [connect_error(), requests.exceptions.InvalidURL()])
+def test_post_never_sent_is_network_error(outcome):
+    session = FakeSession(outcome, outcome, outcome, outcome)
+    cli = client(session)
+
+    with pytest.raises(brain.NetworkError):
+        cli._send(requests.Request("POST", "http://brain/simulations"))
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_simulation_server_error_is_outcome_unknown(status):
+    session = FakeSession(response(status))
+    cli = client(session)
+
+    with pytest.raises(brain.OutcomeUnknownError):
+        cli.simulation().with_expr("rank(close)").send()
+    assert session.sent == ["POST"]
+
+
+@pytest.mark.parametrize(
+    "status, retryable", [(429, True), (503, True), (408, False), (400, False)]
+)
+def test_simulation_retryable(status, retryable):
+    assert brain.SimulationAPIError(response(status)).retryable == retryable
+
+
+def test_post_resent_after_connect_error():
+    session = FakeSession(connect_error(), response(201))
+    cli = client(session)
+
+    resp = cli._send(requests.Request("POST", "http://brain/simulations"))
+    assert resp.status_code == 201
+    assert session.sent == ["POST", "POST"]
+
+
+def test_get_resent_after_read_timeout():
+    session = FakeSession(requests.ReadTimeout(), response(502), response(200))
+    cli = client(session)
+
+    resp = cli._send(requests.Request("GET", "http://brain/simulations/1"))
+    assert resp.status_code == 200
+    assert session.sent == ["GET", "GET", "GET"]
+
+
+def test_post_server_error_counts_against_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    session = FakeSession(response(500))
+    cli = client(session, breaker=breaker)
+
+    resp = cli._send(requests.Request("POST", "http://brain/simulations"))
+    assert resp.status_code == 500
+    assert session.sent == ["POST"]
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize(
+    "outcome",
+    [requests.ReadTimeout(), requests.exceptions.InvalidURL(), ValueError()],
+)
+def test_half_open_probe_failure_reopens(outcome):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.wait()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    cli = client(FakeSession(outcome), breaker=breaker)
+    with pytest.raises(Exception):
+        cli._send(requests.Request("POST", "http://brain/simulations"))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_probe_success_closes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.wait()
+
+    cli = client(FakeSession(response(400)), breaker=breaker)
+    cli._send(requests.Request("POST", "http://brain/simulations"))
+    assert breaker.state == CircuitBreaker.CLOSED